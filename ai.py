@@ -1,182 +1,471 @@
 from constants import *
-from timer import timer
-from board import to_fen
+from board import Board, to_fen, move_name
+from pieces import piece_values, PAWN
+from transposition import *
+from caches import EvalCache, PawnTable
+from book import Book
+from tablebase import Tablebases
+from ordering import MoveOrderer
+from profiler import Profiler, StatsLog, merge, print_stats
 import multiprocessing as mp
+import time
+
+INFINITY = 99999999
+ASPIRATION_WINDOW = 50  # how far either side of the last depth's score the root moves are first searched
+QUIESCENCE_DEPTH = 8  # most captures the quiescence search follows past the end of the main search
+DELTA_MARGIN = 200  # captures that can't bring the score within this of alpha or beta aren't searched
+TABLEBASE_WIN = 9000000  # less the plies to mate, the score of a tablebase win, below any mate the search finds
+# the board methods the profiler times, with the phase each one is counted as
+board_phases = {"legal_moves": "generate", "make_move": "make", "unmake_move": "unmake", "evaluate": "evaluate"}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+_worker = None  # the AI searching in a pool process
+
+
+def _start_worker(hash_size, ordering, table_name, stop, reports, profile, eval_size, pawn_size, tablebases):
+    # runs once in each pool process, the AI made here keeps its tables for as long as the pool lasts
+    # every worker opens the same shared transposition table, stop is set to end the helpers' searches
+    # and the main search puts each depth it finishes on reports
+    global _worker
+    _worker = AI(1, ordering=ordering, table=TranspositionTable(hash_size, name=table_name), profile=profile,
+                 eval_size=eval_size, pawn_size=pawn_size, tablebases=tablebases)
+    _worker.stop = stop
+    _worker.reports = reports
+
+
+def _search_task(task):
+    fen, history, depth, start, budget, helper = task
+    board = Board(string=fen)
+    board.history = history  # so the search sees repetitions of positions from before the one it's given
+    return _worker.iterate(board, depth, start, budget, helper)
 
 
 class AI:
-    def __init__(self, depth):
+    def __init__(self, depth, hash_size=16, movetime=0, ordering=True, workers=0, table=None, profile=False,
+                 log=None, eval_size=4, pawn_size=1, book=None,
+                 tablebases=None):
+        # with a movetime (seconds) the search deepens until the time is used up, otherwise it stops at depth
+        # ordering can be turned off to measure how much it cuts the search down
+        # workers is the number of search processes, 0 for one per core
+        # profile adds detailed counters and timings to the statistics, log is a file they are also written to
+        # eval_size and pawn_size are the MB each worker gives its evaluation cache and pawn table, 0 for none
+        # book is an opening book file, positions found in it are played from the book without searching
+        # tablebases is a directory of endgame tables, positions in them are scored from the table instead of searched
         self.depth = depth - 1
+        self.movetime = movetime
+        self.workers = workers
+        self.processes = 0  # worker processes in the pool, workers or the number of cores once it has started
+        self.pool = None
+        self.stop = None
+        self.reports = None  # the main search's finished depths while it's running, see progress
+        self.tasks = None  # the searches running in the pool, None when the AI isn't thinking
+        self.book = Book(book) if book else None
+        self.book_move = None  # the move found in the book for the position being thought about
+        self.tablebases = Tablebases(tablebases) if tablebases else None
+        self.position = None  # key of the position being searched
+        self.fallback = 0
+        self.pondering = False
+        self.ponder_stats = {"hits": 0, "misses": 0}
+        self.table = table if table is not None else TranspositionTable(hash_size)
+        self.eval_cache = EvalCache(eval_size) if eval_size else None
+        self.pawn_table = PawnTable(pawn_size) if pawn_size else None
+        self.orderer = MoveOrderer() if ordering else None
+        self.profiler = Profiler() if profile else None
+        if self.profiler is not None and self.orderer is not None:
+            self.profiler.attach(self.orderer, {"order": "order"})
+        # called with search_stats after every search
+        self.hooks = [print_stats] + ([StatsLog(log)] if log else [])
+        self.table_stats = {}
+        self.search_stats = {}
+        self.started = 0
+        self.deadline = None
+        self.nodes = 0
+        self.qnodes = 0
+        self.completed_depth = 0
+        self.score = 0
+        self.pv = []
 
-    @timer
-    def move(self, board):
-        # find the best move
-        # make the move
-
-        """
-        ---------------------------------------
-        | 1. For each piece
-        | 2. For each move the piece can make
-        | 3. Evaluate this position
-        | 4. If the position is higher than the current valued position
-        | 5. Set the source coord as the best source coord
-        | 6. Set the dest coord as the best dest coord
-        | 7. After evaluating all moves, move the piece from src to dest
-        ------------------------------------------
-        Loop through pieces using x y range
-        If black set this as temp coord
-        Check highlighted cells
-        For each highlighted cell, create new board copy and move cell from temp coord to highlighted cell
-        Evaluate position
-        If evaluated position is higher than current evaluation, set best coords
-        Move the piece
-
-        """
-        best_source = (0, 0)
-        lowest_eval = 999999999
-        best_move = None
-        best_promoting_move = (-1, -1)
-        boards = []
-        for row in range(NUM_ROWS)[::-1]:
-            for col in range(NUM_ROWS)[::-1]:
-                if board.pieces[row][col].color.value != -1:
-                    continue
-                board.reset_source()
-                board.source_coord = (col, row)
-                board.highlight_cells(True)
-
-                highlighted = list(board.highlighted_cells)
-                if not len(highlighted):
-                    continue
-
-                for move in highlighted:
-                    temp_board = board.copy_board()
-                    temp_board.move_piece(*move, True)
-
-                    if temp_board.promote:
-                        for promoting_move in temp_board.highlighted_cells:
-                            promoting_temp_board = temp_board.copy_board()
-                            promoting_temp_board.move_piece(*promoting_move, True)
-
-                            promoting_eval = self.minimax(promoting_temp_board)
-                            if promoting_eval < lowest_eval:
-                                lowest_eval = promoting_eval
-                                best_source = (col, row)
-                                best_move = move
-                                best_promoting_move = promoting_move
-
-                    else:
-                        boards.append(temp_board)
-
-        pool = mp.Pool()
-        data = pool.map(self.minimax, boards)
-        pool.close()
-
-        if boards:
-            boards = dict(zip(boards, data))
-            best_board = min(boards, key=boards.get)
-            if boards[best_board] < lowest_eval:
-                best_source = best_board.source_coord
-                best_move = best_board.moved_to
-                best_promoting_move = (-1, -1)
-
-        board.source_coord = best_source
-
-        board.move_piece(*best_move, True)
-        if best_promoting_move != (-1, -1):
-            board.move_piece(*best_promoting_move, True)
+    def start(self):
+        # the pool is started on the first move and kept until close, so the workers keep their tables between moves
+        if self.pool is None:
+            if self.table.name is None:
+                self.table = TranspositionTable(self.table.size, shared=True)
+            self.stop = mp.RawValue("b", 0)
+            # a simple queue writes straight to its pipe, so a depth is always there before the search's result
+            self.reports = mp.SimpleQueue()
+            self.processes = self.workers or mp.cpu_count()
+            self.pool = mp.Pool(self.processes, _start_worker,
+                                (self.table.size, self.orderer is not None, self.table.name, self.stop, self.reports,
+                                 self.profiler is not None, self.eval_cache and self.eval_cache.size,
+                                 self.pawn_table and self.pawn_table.size,
+                                 self.tablebases and self.tablebases.directory))
+
+    def close(self):
+        self.cancel()
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+        if self.tablebases is not None:
+            self.tablebases.close()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+            self.table.close()
+
+    def budget(self, movetime=None, clock=None, increment=0):
+        # seconds to spend on this move, 0 for no limit
+        if movetime:
+            return movetime
+        if clock is not None:
+            return min(clock / 20 + increment, clock / 2)
+        return self.movetime
+
+    def move(self, board, movetime=None, clock=None, increment=0):
+        # finds the best move and makes it
+        self.play(board, self.think(board, movetime, clock, increment))
+
+    def play(self, board, best_move):
+        board.make_move(best_move, played=True)
+        board.moved_to = x, y = (best_move >> 6 & 7, best_move >> 9 & 7)
         board.reset_source()
         with open("game.txt", "a") as file:
             file.write(to_fen(board) + "\n")
-        x, y = best_move
         with open("pgn.txt", "a") as file:
-            file.write(f"{board.pieces[y][x].image}{chr(x + 97)}{8 - y} ")
-
-
-    def minimax(self, board, depth=None, white=True, alpha=-99999999, beta=99999999) -> int:
-        """
-        white value = 1
-        black value = 0
-        create a list, return a value
-        if depth == 1:
-            for every piece make every move
-            create list of eval
-            if white return highest
-            otherwise return lowest
+            file.write(f"{board.piece_at(x, y).image}{chr(x + 97)}{8 - y} ")
+
+    def think(self, board, movetime=None, clock=None, increment=0):
+        # the best move for the side to move, without making it
+        self.begin(board, movetime, clock, increment)
+        return self.result()
+
+    def begin(self, board, movetime=None, clock=None, increment=0):
+        # starts searching board in the pool and returns straight away, result waits for the move
+        # lazy smp, every worker searches the whole position and they share what they find through the table
+        # only the first worker's result is used, the others are there to fill the table for it
+        # a search of this position that is already running carries on, like pondering on the move the player made
+        if self.thinking(board):
+            if self.pondering:
+                self.ponder_stats["hits"] += 1
+                self.pondering = False
+            return
+        if self.pondering:
+            self.ponder_stats["misses"] += 1
+        self.cancel()
+        if self.book is not None and (move := self.book.probe(board)) is not None:
+            self.book_move = move
+            self.position = board.key
+            return
+        budget = self.budget(movetime, clock, increment)
+        self.start()
+        self.fallback = board.legal_moves()[0]
+        self.position = board.key
+        self.started = time.time()
+        task = (to_fen(board), board.history[-board.half - 1:], 64 if budget else self.depth + 1, self.started, budget)
+        self.tasks = [self.pool.apply_async(_search_task, (task + (helper,),))
+                      for helper in range(self.processes)]
+
+    def thinking(self, board=None):
+        # True while searching, with a board only if it's that position being searched
+        return (self.tasks is not None or self.book_move is not None) and (board is None or board.key == self.position)
+
+    def ponder(self, board):
+        # called after the AI's move, searches the reply the principal variation expects while the player thinks
+        # begin picks the search up if the guess was right, otherwise the table keeps what was found
+        if len(self.pv) < 2 or board.quit or self.pv[1] not in board.legal_moves():
+            return
+        board.make_move(self.pv[1], played=True)
+        if not board.quit:
+            self.begin(board)
+            self.pondering = True
+        board.unmake_move()
+
+    def ready(self):
+        # True once the move can be taken from result without waiting
+        return self.book_move is not None or self.tasks is not None and self.tasks[0].ready()
+
+    def cancel(self):
+        # stops the search without using its result
+        self.pondering = False
+        self.book_move = None
+        if self.tasks is not None:
+            self.stop.value = 1
+            for task in self.tasks:
+                task.wait()
+            self.stop.value = 0
+            self.tasks = None
+            self.progress()  # nothing else reads the cancelled search's depths, and a full pipe would block the workers
+
+    def progress(self):
+        # the depths the main search has finished since the last call, as dicts of depth, score, pv, nodes and time
+        reports = []
+        while self.reports is not None and not self.reports.empty():
+            report = self.reports.get()
+            if report["start"] == self.started:  # not from a search that was cancelled
+                reports.append(report)
+        return reports
+
+    def finish(self):
+        # stops the search and returns the best move of the last depth it finished
+        self.pondering = False
+        if self.stop is not None:
+            self.stop.value = 1
+        return self.result()
+
+    def result(self):
+        if self.book_move is not None:
+            self.pv = [self.book_move]
+            self.book_move = None
+            return self.pv[0]
+        tasks = self.tasks
+        results = [tasks[0].get()]
+        self.stop.value = 1  # the helpers stop as soon as the main search is done
+        results += [helper.get() for helper in tasks[1:]]
+        self.stop.value = 0
+        self.tasks = None
+
+        main = results[0]
+        self.score = main["score"]
+        self.pv = main["pv"]
+        self.completed_depth = main["depth"]
+        depth_nodes = main["depth_nodes"]
+        probes = sum(result["probes"] for result in results)
+        hits = sum(result["hits"] for result in results)
+        self.table_stats = {"probes": probes, "hits": hits, "fill": main["fill"]}
+        # effective branching factor, how many times more nodes each depth took than the one before
+        ebf = (depth_nodes[-1] / depth_nodes[0]) ** (1 / (len(depth_nodes) - 1)) if len(depth_nodes) > 1 else 0
+        self.search_stats = {"depth": self.completed_depth, "score": self.score,
+                             "pv": [move_name(move) for move in self.pv], "time": time.time() - self.started,
+                             "nodes": sum(result["nodes"] for result in results),
+                             "qnodes": sum(result["qnodes"] for result in results),
+                             "depth_nodes": depth_nodes, "depth_times": main["depth_times"], "ebf": ebf,
+                             "workers": len(results), **self.table_stats}
+        for name in ("eval_probes", "eval_hits", "pawn_probes", "pawn_hits"):
+            self.search_stats[name] = sum(result[name] for result in results)
+        if self.profiler is not None:
+            self.search_stats["profile"] = merge(result["profile"] for result in results)
+        for hook in self.hooks:
+            hook(self.search_stats)
+        self.progress()  # any depths the hooks didn't read
+        return self.pv[0] if self.pv else self.fallback
+
+    def iterate(self, board, depth, start=None, budget=0, helper=0):
+        # iterative deepening, runs in a pool worker with the result going back to the main process
+        # odd numbered helpers search a ply deeper than the others so the workers don't all repeat the same search
+        probes, hits, nodes, qnodes = self.table.probes, self.table.hits, self.nodes, self.qnodes
+        board.eval_cache = self.eval_cache
+        board.pawn_table = self.pawn_table
+        caches = self.cache_stats()
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.reset()
+            profiler.count("boards")
+            profiler.attach(board, board_phases)
+        score = None
+        pv = []
+        completed = 0
+        depth_nodes = []
+        depth_times = []  # seconds from the start of the search until each depth finished
+        made = len(board.undo_stack)
+        for completed_depth in range(1, depth + 1):
+            # depth 1 always finishes so there is a move to play
+            self.deadline = start + budget if budget and completed_depth > 1 else None
+            before = self.nodes
+            try:
+                score, pv = self.aspiration(board, completed_depth + (helper & 1), score)
+            except SearchTimeout:
+                # the search stopped part way down a line, take its moves back so the board is as it was given
+                while len(board.undo_stack) > made:
+                    board.unmake_move()
+                break
+            depth_nodes.append(self.nodes - before)
+            depth_times.append(time.time() - start)
+            completed = completed_depth
+            if self.reports is not None and not helper:
+                self.reports.put({"start": start, "depth": completed, "score": score, "pv": pv,
+                                  "nodes": self.nodes + self.qnodes - nodes - qnodes, "time": depth_times[-1]})
+            if budget and time.time() - start > budget / 2:
+                break  # the next depth wouldn't finish in time
+        if profiler is not None:
+            profiler.detach(board, board_phases)
+        return {"score": score, "pv": pv, "depth": completed, "depth_nodes": depth_nodes, "depth_times": depth_times,
+                "nodes": self.nodes - nodes, "qnodes": self.qnodes - qnodes, "probes": self.table.probes - probes,
+                "hits": self.table.hits - hits, "fill": self.table.fill(),
+                **{name: value - caches[name] for name, value in self.cache_stats().items()},
+                "profile": profiler.snapshot() if profiler is not None else None}
+
+    def cache_stats(self):
+        stats = {"eval_probes": 0, "eval_hits": 0, "pawn_probes": 0, "pawn_hits": 0}
+        if self.eval_cache is not None:
+            stats["eval_probes"], stats["eval_hits"] = self.eval_cache.probes, self.eval_cache.hits
+        if self.pawn_table is not None:
+            stats["pawn_probes"], stats["pawn_hits"] = self.pawn_table.probes, self.pawn_table.hits
+        return stats
+
+    def aspiration(self, board, depth, guess=None):
+        # guess is the score from the last depth, the search starts with a narrow window around it
+        if guess is None:
+            alpha, beta = -INFINITY, INFINITY
         else:
-            x = []
-            for each piece make every move
-            x.append(minimax(board, depth - 1, not white))
-            if white return highest
-            else return lowest
+            alpha, beta = guess - ASPIRATION_WINDOW, guess + ASPIRATION_WINDOW
+        while True:
+            score, pv = self.search(board, depth, alpha, beta)
+            # outside the window the score is only a bound, so search again with that side opened up
+            if score <= alpha:
+                alpha = -INFINITY
+            elif score >= beta:
+                beta = INFINITY
+            else:
+                return score, pv
 
-        """
+    def search(self, board, depth=None, alpha=-INFINITY, beta=INFINITY, ply=0):
+        # negamax with principal variation search, scores are for the side to move
+        # returns the score and the principal variation, the moves both sides are expected to play from here
         if depth is None:
             depth = self.depth
+        self.nodes += 1
+        if not self.nodes & 1023 and (self.stop is not None and self.stop.value or
+                                      self.deadline is not None and time.time() > self.deadline):
+            raise SearchTimeout
+        # a game over at the root still has its moves searched, a gui that didn't adjudicate it wants one played
+        if board.quit and (ply or not board.legal_moves()):
+            return board.turn * board.evaluate(), []
+        if ply and board.repetitions():
+            return 0, []  # a repeated position is a draw, whoever is repeating it can keep doing so
+        if ply and self.tablebases is not None:
+            found = self.tablebases.probe(board)
+            if found is not None:
+                result, plies = found
+                return result * (TABLEBASE_WIN - plies), []
         if not depth:
-            return board.evaluate()
-        # do stuff
-        val = [-1, 1][white]  # val = 1 if white else -1
-        board.turn = val
-
-        if white:
-            max_eval = -99999999
-            for rowy in range(NUM_ROWS)[::-1]:
-                for colx in range(NUM_ROWS)[::-1]:
-                    if board.pieces[rowy][colx].color.value == val:
-                        board.reset_source()
-                        board.source_coord = (colx, rowy)
-                        board.highlight_cells(True)
-
-                        for move in board.highlighted_cells:
-                            temp_board = board.copy_board()
-                            temp_board.move_piece(*move, True)
-                            if temp_board.promote:
-                                highest_promoting_eval = -99999999
-                                for promoting_move in temp_board.highlighted_cells:
-                                    promoting_temp_board = temp_board.copy_board()
-                                    promoting_temp_board.move_piece(*promoting_move, True)
-                                    promoting_eval = self.minimax(promoting_temp_board, 1, white, alpha, beta)
-
-                                    highest_promoting_eval = max(promoting_eval, highest_promoting_eval)
-                                _eval = highest_promoting_eval
-                            elif temp_board.quit:
-                                _eval = temp_board.evaluate()
-                            else:
-                                _eval = self.minimax(temp_board, depth - 1, not white, alpha, beta)
-
-                            max_eval = max(max_eval, _eval)
-                            alpha = max(alpha, _eval)
-                            if beta <= alpha:
-                                return max_eval
-            return max_eval
-
-        # if not white
-        min_eval = 99999999
-        for rowy in range(NUM_ROWS)[::-1]:
-            for colx in range(NUM_ROWS)[::-1]:
-                if board.pieces[rowy][colx].color.value == val:
-                    board.reset_source()
-                    board.source_coord = (colx, rowy)
-                    board.highlight_cells(True)
-
-                    for move in board.highlighted_cells:
-                        temp_board = board.copy_board()
-                        temp_board.move_piece(*move, True)
-                        if temp_board.promote:
-                            lowest_promoting_eval = 99999999
-                            for promoting_move in temp_board.highlighted_cells:
-                                promoting_temp_board = temp_board.copy_board()
-                                promoting_temp_board.move_piece(*promoting_move, True)
-                                promoting_eval = self.minimax(promoting_temp_board, 1, white, alpha, beta)
-                                lowest_promoting_eval = min(promoting_eval, lowest_promoting_eval)
-                            _eval = lowest_promoting_eval
-                        elif temp_board.quit:
-                            _eval = temp_board.evaluate()
-                        else:
-                            _eval = self.minimax(temp_board, depth - 1, not white, alpha, beta)
-                        min_eval = min(min_eval, _eval)
-                        beta = min(beta, _eval)
-                        if beta <= alpha:
-                            return min_eval
-        return min_eval
+            return self.quiescence(board, alpha, beta, ply), []
+
+        entry = self.table.probe(board.key)
+        # the root is always searched so there is a move to play
+        if ply and entry is not None and entry[0] >= depth:
+            _, score, bound, move = entry
+            if bound == EXACT:
+                return score, [move] if move else []
+            if bound == LOWER:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if beta <= alpha:
+                return score, [move] if move else []
+        window = (alpha, beta)
+        moves = board.legal_moves()
+        if not moves:
+            return 0, []  # stalemate, checkmate already set quit when the last move was made
+        if self.orderer is not None:
+            moves = self.orderer.order(board, moves, entry[3] if entry is not None else 0, ply)
+
+        best_score = -INFINITY
+        best_move = 0
+        pv = []
+        for i, move in enumerate(moves):
+            board.make_move(move, True)
+            if i == 0:
+                score, child_pv = self.search(board, depth - 1, -beta, -alpha, ply + 1)
+                score = -score
+            else:
+                # later moves only have to be shown to be worse than the best so far, which a null window does quickly
+                score, child_pv = self.search(board, depth - 1, -alpha - 1, -alpha, ply + 1)
+                score = -score
+                if alpha < score < beta:
+                    score, child_pv = self.search(board, depth - 1, -beta, -alpha, ply + 1)
+                    score = -score
+            board.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    pv = [move] + child_pv
+            if alpha >= beta:
+                if self.orderer is not None:
+                    self.orderer.cutoff(board, move, ply, depth)
+                if self.profiler is not None:
+                    self.profiler.cutoff(i)
+                break
+        self.remember(board, depth, best_score, window, best_move)
+        return best_score, pv
+
+    def remember(self, board, depth, score, window, move):
+        # store the result with what it says about the real score given the alpha-beta window it was searched with
+        alpha, beta = window
+        if score <= alpha:
+            bound = UPPER
+        elif score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(board.key, depth, score, bound, move)
+
+    def quiescence(self, board, alpha, beta, ply, depth=0):
+        # only captures and promotions are searched, so the score isn't taken in the middle of an exchange
+        self.qnodes += 1
+        stand_pat = board.turn * board.evaluate()
+        if board.quit or depth == QUIESCENCE_DEPTH:
+            return stand_pat
+        # the side to move doesn't have to capture, so it can stand pat on the evaluation
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        squares = board.squares
+        moves = board.legal_moves(captures=True)
+        if self.orderer is not None:
+            moves = self.orderer.order(board, moves, 0, ply)
+
+        best_score = stand_pat
+        for move in moves:
+            gain = piece_values[squares[move >> 6 & 63] & 7]
+            if move >> 12:
+                gain += piece_values[move >> 12] - piece_values[PAWN]
+            if stand_pat + gain + DELTA_MARGIN <= alpha:
+                continue
+            board.make_move(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1, depth + 1)
+            board.unmake_move()
+            if score > best_score:
+                best_score = score
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    break
+        return best_score
+
+
+if __name__ == "__main__":
+    # scaling report, the time each number of workers takes to search a few positions to the same depth
+    import sys
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    positions = [STRING,
+                 "r3k2r/pppq1ppp/2npbn2/4p3/4P3/2NPBN2/PPPQ1PPP/R3K2R b KQkq - 0 1",
+                 "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"]
+    rows = []
+    base = None
+    for workers in (1, 2, 4, 8):
+        ai = AI(depth, workers=workers)
+        ai.hooks = []
+        ai.start()  # the pool start up isn't part of the search time
+        elapsed = 0
+        nodes = 0
+        for fen in positions:
+            ai.table.clear()
+            begin = time.perf_counter()
+            ai.think(Board(string=fen))
+            elapsed += time.perf_counter() - begin
+            nodes += ai.search_stats["nodes"]
+        ai.close()
+        base = base or elapsed
+        # efficiency is the speedup per worker, 100% would be perfect scaling
+        rows.append(f"{workers:7} {elapsed:6.2f}s {base / elapsed:8.2f}x {base / elapsed / workers:11.1%} {nodes:8}")
+    print(f"{mp.cpu_count()} cores, depth {depth}")
+    print("workers   time   speedup   efficiency   nodes")
+    print("\n".join(rows))
@@ -0,0 +1,92 @@
+from ai import AI
+from board import Board, move_name
+from constants import STRING
+import argparse
+import json
+import sys
+import time
+
+# positions every benchmark searches, openings, middlegames and endgames
+positions = [
+    STRING,
+    "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1",
+    "r3k2r/pppq1ppp/2npbn2/4p3/4P3/2NPBN2/PPPQ1PPP/R3K2R b KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "4k3/8/8/8/8/8/6p1/4K2R b - - 0 1",
+]
+
+
+def benchmark(depth=4, workers=1, hash_size=16, profile=False, eval_size=4, pawn_size=1):
+    # searches every position to depth from an empty table, one worker keeps the node counts repeatable
+    ai = AI(depth, hash_size, workers=workers, profile=profile, eval_size=eval_size, pawn_size=pawn_size)
+    ai.hooks = []
+    ai.start()  # the pool start up isn't part of the search time
+    results = []
+    for fen in positions:
+        ai.table.clear()
+        start = time.perf_counter()
+        move = ai.think(Board(string=fen))
+        elapsed = time.perf_counter() - start
+        stats = ai.search_stats
+        results.append({"fen": fen, "move": move_name(move), "score": ai.score,
+                        "pv": [move_name(move) for move in ai.pv], "nodes": stats["nodes"], "qnodes": stats["qnodes"],
+                        "time": elapsed, "nps": (stats["nodes"] + stats["qnodes"]) / elapsed,
+                        "depth_nodes": stats["depth_nodes"], "depth_times": stats["depth_times"],
+                        "ebf": stats["ebf"], "eval_hits": stats["eval_hits"] / max(stats["eval_probes"], 1),
+                        "pawn_hits": stats["pawn_hits"] / max(stats["pawn_probes"], 1)})
+        if profile:
+            results[-1]["profile"] = stats["profile"]
+    ai.close()
+    nodes = sum(result["nodes"] + result["qnodes"] for result in results)
+    elapsed = sum(result["time"] for result in results)
+    return {"depth": depth, "workers": workers, "hash": hash_size, "eval_hash": eval_size, "pawn_hash": pawn_size,
+            "nodes": nodes, "time": elapsed,
+            "nps": nodes / elapsed, "positions": results}
+
+
+def compare(baseline, current):
+    # prints how the current run differs from the baseline, returns the number of positions with a different result
+    changed = 0
+    for old, new in zip(baseline["positions"], current["positions"]):
+        same = old["move"] == new["move"] and old["score"] == new["score"]
+        changed += not same
+        print(f"{new['fen']}\n    move {old['move']} -> {new['move']}, score {old['score']} -> {new['score']}"
+              f"{'' if same else ' CHANGED'}\n    nodes {old['nodes'] + old['qnodes']} -> {new['nodes'] + new['qnodes']}"
+              f" ({(new['nodes'] + new['qnodes']) / (old['nodes'] + old['qnodes']) - 1:+.1%}), "
+              f"time {old['time']:.3f}s -> {new['time']:.3f}s ({new['time'] / old['time'] - 1:+.1%})")
+    print(f"total nodes {baseline['nodes']} -> {current['nodes']} ({current['nodes'] / baseline['nodes'] - 1:+.1%}), "
+          f"time {baseline['time']:.3f}s -> {current['time']:.3f}s ({current['time'] / baseline['time'] - 1:+.1%}), "
+          f"nps {baseline['nps']:.0f} -> {current['nps']:.0f} ({current['nps'] / baseline['nps'] - 1:+.1%})")
+    print(f"{changed} of {len(current['positions'])} results changed")
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="search a fixed set of positions and report how the AI did as json")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size in MB")
+    parser.add_argument("--eval-hash", type=int, default=4, help="evaluation cache size in MB, 0 for none")
+    parser.add_argument("--pawn-hash", type=int, default=1, help="pawn table size in MB, 0 for none")
+    parser.add_argument("--profile", action="store_true", help="include the profiler's counters and timings")
+    parser.add_argument("--save", help="file to write the results to, for comparing against later")
+    parser.add_argument("--compare", help="results saved earlier, the run uses the same settings as they did")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)
+        current = benchmark(baseline["depth"], baseline["workers"], baseline["hash"], args.profile,
+                            baseline.get("eval_hash", 0), baseline.get("pawn_hash", 0))
+    else:
+        current = benchmark(args.depth, args.workers, args.hash, args.profile, args.eval_hash, args.pawn_hash)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(current, file, indent=2)
+
+    if args.compare:
+        sys.exit(compare(baseline, current) != 0)
+    print(json.dumps(current, indent=2))
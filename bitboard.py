@@ -0,0 +1,321 @@
+from pieces import *
+from zobrist import compute_key
+
+# bit y * 8 + x of a bitboard is the square (x, y), the same numbering as Board.squares
+FULL = (1 << 64) - 1
+FILE_A = sum(1 << (y * 8) for y in range(8))
+FILE_H = FILE_A << 7
+RANK_8 = 0xFF  # y == 0, where white pawns promote
+RANK_1 = 0xFF << 56  # y == 7, where black pawns promote
+RANK_6 = 0xFF << 16  # y == 2, black pawns that can push twice get here after one push
+RANK_3 = 0xFF << 40  # y == 5, the same for white pawns
+
+# ray directions, the first four step towards higher squares and the last four towards lower squares
+directions = [(1, 0), (0, 1), (1, 1), (-1, 1), (-1, 0), (0, -1), (-1, -1), (1, -1)]
+
+
+def _bit_table(offsets):
+    table = []
+    for sq in range(64):
+        x, y = sq & 7, sq >> 3
+        table.append(sum(1 << ((y + dy) * 8 + x + dx) for dx, dy in offsets if 0 <= x + dx <= 7 and 0 <= y + dy <= 7))
+    return table
+
+
+def _ray_table(dx, dy):
+    table = []
+    for sq in range(64):
+        x, y = (sq & 7) + dx, (sq >> 3) + dy
+        ray = 0
+        while 0 <= x <= 7 and 0 <= y <= 7:
+            ray |= 1 << (y * 8 + x)
+            x += dx
+            y += dy
+        table.append(ray)
+    return table
+
+
+knight_attacks = _bit_table([(2, -1), (2, 1), (1, -2), (1, 2), (-2, -1), (-2, 1), (-1, -2), (-1, 2)])
+king_attacks = _bit_table([(0, -1), (0, 1), (-1, 0), (1, 0), (1, -1), (-1, -1), (1, 1), (-1, 1)])
+# squares a pawn on a square attacks, index 0 for white pawns (moving up the board) and 1 for black
+pawn_attacks = [_bit_table([(-1, -1), (1, -1)]), _bit_table([(-1, 1), (1, 1)])]
+rays = [_ray_table(dx, dy) for dx, dy in directions]
+
+# squares strictly between two squares on the same line, 0 if they aren't on a line
+between = [[0] * 64 for _ in range(64)]
+for _direction in range(8):
+    for _sq in range(64):
+        for _target in range(64):
+            if rays[_direction][_sq] >> _target & 1:
+                between[_sq][_target] = rays[_direction][_sq] & ~rays[_direction][_target] & ~(1 << _target)
+
+# pawn structure, scored from white's side
+DOUBLED_PAWN = -15  # for each pawn on a file after the first
+ISOLATED_PAWN = -12  # for each pawn with no pawns of its own color on the files either side
+passed_pawn_bonus = [0, 5, 10, 20, 35, 60, 100, 0]  # by how many ranks the pawn is from its own back rank
+files = [FILE_A << x for x in range(8)]
+adjacent_files = [(files[x - 1] if x else 0) | (files[x + 1] if x < 7 else 0) for x in range(8)]
+# squares ahead of a pawn on its own and the adjacent files, a pawn with no enemy pawns there is passed
+passed_masks = [[((1 << (sq & ~7)) - 1) & (files[sq & 7] | adjacent_files[sq & 7]) for sq in range(64)],
+                [(FULL ^ ((1 << ((sq | 7) + 1)) - 1)) & (files[sq & 7] | adjacent_files[sq & 7]) for sq in range(64)]]
+
+
+def ray_attacks(direction, sq, occupied):
+    # squares seen along a ray, up to and including the first piece on it
+    ray = rays[direction][sq]
+    blockers = ray & occupied
+    if blockers:
+        if direction < 4:
+            first = (blockers & -blockers).bit_length() - 1
+        else:
+            first = blockers.bit_length() - 1
+        ray ^= rays[direction][first]
+    return ray
+
+
+def rook_attacks(sq, occupied):
+    return ray_attacks(0, sq, occupied) | ray_attacks(1, sq, occupied) | \
+        ray_attacks(4, sq, occupied) | ray_attacks(5, sq, occupied)
+
+
+def bishop_attacks(sq, occupied):
+    return ray_attacks(2, sq, occupied) | ray_attacks(3, sq, occupied) | \
+        ray_attacks(6, sq, occupied) | ray_attacks(7, sq, occupied)
+
+
+def attackers(board, sq, side, occupied):
+    # pieces of side (0 white, 1 black) attacking sq, sliders are blocked by occupied
+    bitboards = board.bitboards
+    color = BLACK if side else 0
+    queens = bitboards[QUEEN | color]
+    return knight_attacks[sq] & bitboards[KNIGHT | color] | king_attacks[sq] & bitboards[KING | color] | \
+        pawn_attacks[not side][sq] & bitboards[PAWN | color] | \
+        bishop_attacks(sq, occupied) & (bitboards[BISHOP | color] | queens) | \
+        rook_attacks(sq, occupied) & (bitboards[ROOK | color] | queens)
+
+
+def pins(board, king, side, occupied):
+    # pinned pieces of side mapped to the squares they can still move to, the line up to and including the pinner
+    pinned = {}
+    bitboards = board.bitboards
+    enemy = 0 if side else BLACK
+    own = board.occupied[side]
+    for direction in range(8):
+        blockers = rays[direction][king] & occupied
+        if not blockers:
+            continue
+        first = (blockers & -blockers).bit_length() - 1 if direction < 4 else blockers.bit_length() - 1
+        if not own >> first & 1:
+            continue
+        blockers ^= 1 << first
+        if not blockers:
+            continue
+        second = (blockers & -blockers).bit_length() - 1 if direction < 4 else blockers.bit_length() - 1
+        # directions 2, 3, 6 and 7 are the diagonals
+        sliders = bitboards[(BISHOP if direction & 2 else ROOK) | enemy] | bitboards[QUEEN | enemy]
+        if sliders >> second & 1:
+            pinned[first] = between[king][second] | 1 << second
+    return pinned
+
+
+def squares_of(bitboard):
+    squares = []
+    while bitboard:
+        low = bitboard & -bitboard
+        squares.append(low.bit_length() - 1)
+        bitboard ^= low
+    return squares
+
+
+def pawn_structure(white, black):
+    # doubled, isolated and passed pawns for the white and black pawn bitboards
+    score = 0
+    for side, pawns, enemy, sign in ((0, white, black, 1), (1, black, white, -1)):
+        for x in range(8):
+            count = bin(pawns & files[x]).count("1")
+            if count > 1:
+                score += sign * DOUBLED_PAWN * (count - 1)
+            if count and not pawns & adjacent_files[x]:
+                score += sign * ISOLATED_PAWN * count
+        for sq in squares_of(pawns):
+            if not passed_masks[side][sq] & enemy:
+                score += sign * passed_pawn_bonus[sq >> 3 if side else 7 - (sq >> 3)]
+    return score
+
+
+def board_bitboards(squares):
+    # one bitboard per piece code and one occupancy bitboard per color
+    bitboards = [0] * 16
+    occupied = [0, 0]
+    for sq, code in enumerate(squares):
+        if code:
+            bitboards[code] |= 1 << sq
+            occupied[code >> 3] |= 1 << sq
+    return bitboards, occupied
+
+
+def _add_pawn_moves(moves, targets, offset, promoting):
+    for target in squares_of(targets):
+        if 1 << target & promoting:
+            for promotion in promotion_pieces:
+                moves.append(target - offset | target << 6 | promotion << 12)
+        else:
+            moves.append(target - offset | target << 6)
+
+
+def generate_moves(board, captures=False):
+    # every move the side to move can make without looking at checks, the same moves Board.targets finds
+    # with captures set only captures and promotions are generated
+    moves = []
+    bitboards = board.bitboards
+    side = board.turn == -1
+    color = BLACK if side else 0
+    own = board.occupied[side]
+    occupied = own | board.occupied[not side]
+    enemy = board.occupied[not side]
+    empty = FULL ^ occupied
+    targets = enemy if captures else FULL ^ own
+
+    # pawns on the first or last rank can't move
+    pawns = bitboards[PAWN | color] & ~(RANK_1 | RANK_8)
+    if side:
+        single = pawns << 8 & empty
+        _add_pawn_moves(moves, single & RANK_1 if captures else single, 8, RANK_1)
+        if not captures:
+            _add_pawn_moves(moves, (single & RANK_6) << 8 & empty, 16, RANK_1)
+        _add_pawn_moves(moves, (pawns & ~FILE_A) << 7 & enemy, 7, RANK_1)
+        _add_pawn_moves(moves, (pawns & ~FILE_H) << 9 & enemy, 9, RANK_1)
+    else:
+        single = pawns >> 8 & empty
+        _add_pawn_moves(moves, single & RANK_8 if captures else single, -8, RANK_8)
+        if not captures:
+            _add_pawn_moves(moves, (single & RANK_3) >> 8 & empty, -16, RANK_8)
+        _add_pawn_moves(moves, (pawns & ~FILE_A) >> 9 & enemy, -9, RANK_8)
+        _add_pawn_moves(moves, (pawns & ~FILE_H) >> 7 & enemy, -7, RANK_8)
+
+    for sq in squares_of(bitboards[KNIGHT | color]):
+        for target in squares_of(knight_attacks[sq] & targets):
+            moves.append(sq | target << 6)
+    for sq in squares_of(bitboards[BISHOP | color] | bitboards[QUEEN | color]):
+        for target in squares_of(bishop_attacks(sq, occupied) & targets):
+            moves.append(sq | target << 6)
+    for sq in squares_of(bitboards[ROOK | color] | bitboards[QUEEN | color]):
+        for target in squares_of(rook_attacks(sq, occupied) & targets):
+            moves.append(sq | target << 6)
+
+    if board.ep != -1:
+        # en passant, from the squares an enemy pawn on the en passant square would attack
+        for sq in squares_of(pawn_attacks[not side][board.ep] & pawns):
+            moves.append(sq | board.ep << 6)
+
+    king = board.kings[side]
+    for target in squares_of(king_attacks[king] & targets):
+        moves.append(king | target << 6)
+    rights = board.castling >> 2 if side else board.castling
+    # no castling out of check or through an attacked square, moving into check is left to legal_moves
+    if rights and not captures and not attackers(board, king, not side, occupied):
+        rook = bitboards[ROOK | color]
+        if rights & 1 and rook >> (king + 3) & 1 and not occupied >> (king + 1) & 3 and \
+                not attackers(board, king + 1, not side, occupied):
+            moves.append(king | (king + 2) << 6)
+        if rights & 2 and rook >> (king - 4) & 1 and not occupied >> (king - 3) & 7 and \
+                not attackers(board, king - 1, not side, occupied):
+            moves.append(king | (king - 2) << 6)
+    return moves
+
+
+def legal_moves(board, captures=False):
+    # the pseudo-legal moves, filtered with the checkers and pins of the side to move instead of making each move
+    side = board.turn == -1
+    king = board.kings[side]
+    occupied = board.occupied[0] | board.occupied[1]
+    checkers = attackers(board, king, not side, occupied)
+    if checkers & (checkers - 1):
+        allowed = 0  # double check, only the king can move
+    elif checkers:
+        allowed = checkers | between[king][checkers.bit_length() - 1]  # capture or block the checker
+    else:
+        allowed = FULL
+    pinned = pins(board, king, side, occupied)
+    without_king = occupied ^ 1 << king
+
+    moves = []
+    for move in generate_moves(board, captures):
+        source = move & 63
+        to = move >> 6 & 63
+        if source == king:
+            if not attackers(board, to, not side, without_king):
+                moves.append(move)
+        elif to == board.ep and board.squares[source] & 7 == PAWN:
+            # en passant takes a pawn off a square it doesn't move to, so it's tested by making it
+            board.make_move(move)
+            if not attackers(board, king, not side, board.occupied[0] | board.occupied[1]):
+                moves.append(move)
+            board.unmake_move()
+        elif allowed >> to & 1 and (source not in pinned or pinned[source] >> to & 1):
+            moves.append(move)
+    return moves
+
+
+def cross_check(board):
+    # the bitboard moves have to match the moves Board.targets finds square by square
+    from board import evaluation_totals  # board imports this module, so it can't be imported at the top
+    bitboard_moves = set(generate_moves(board))
+    square_moves = set()
+    for sq in range(64):
+        square_moves.update(board.generate_moves(sq))
+    if bitboard_moves != square_moves:
+        raise AssertionError(f"bitboard moves differ: missing {square_moves - bitboard_moves}, "
+                             f"extra {bitboard_moves - square_moves}")
+    if (board.bitboards, board.occupied) != board_bitboards(board.squares):
+        raise AssertionError("bitboards are out of sync with the squares")
+    if board.key != compute_key(board):
+        raise AssertionError("zobrist key is out of sync with the position")
+    if (board.material, board.phase) != evaluation_totals(board.squares):
+        raise AssertionError("evaluation totals are out of sync with the position")
+
+    # legal moves have to be the pseudo-legal moves that don't leave the king attacked once made
+    tested = set()
+    for move in bitboard_moves:
+        board.make_move(move)
+        if not board.attacked(board.kings[board.turn == 1], board.turn):
+            tested.add(move)
+        board.unmake_move()
+    legal = set(legal_moves(board))
+    if legal != tested:
+        raise AssertionError(f"legal moves differ: missing {tested - legal}, extra {legal - tested}")
+    noisy = set(move for move in legal if board.squares[move >> 6 & 63] or move >> 12 or
+                move >> 6 & 63 == board.ep and board.squares[move & 63] & 7 == PAWN)
+    if set(legal_moves(board, True)) != noisy:
+        raise AssertionError("capture generation differs from the captures and promotions in the legal moves")
+
+
+if __name__ == "__main__":
+    # plays random games from a few positions and cross checks the move generators at every move
+    import random
+    import sys
+    from board import Board, to_fen
+    from constants import STRING
+
+    positions = [STRING,
+                 "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                 "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                 "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"]
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    random.seed(0)
+    checked = 0
+    for game in range(games):
+        board = Board(string=positions[game % len(positions)])
+        for _ in range(200):
+            try:
+                cross_check(board)
+            except AssertionError:
+                print(to_fen(board))
+                raise
+            checked += 1
+            moves = board.legal_moves()
+            if not moves or board.quit:
+                break
+            board.make_move(random.choice(moves), played=True)
+    print(f"{checked} positions match")
@@ -1,6 +1,7 @@
 from pieces import *
+from bitboard import board_bitboards, generate_moves, legal_moves, attackers, pawn_structure
+from zobrist import *
 from copy import copy
-from numpy import add
 
 pawn_table = [[0, 0, 0, 0, 0, 0, 0, 0],
               [100, 100, 100, 100, 100, 100, 100, 100],
@@ -76,70 +77,138 @@ tables = {
 }
 
 
+# flat tables indexed by piece code then square (y * 8 + x), with the piece value and color sign folded in
+piece_square = [[0] * 64 for _ in range(16)]
+phase_weights = [0] * 16
+for _char, _code in codes_dict.items():
+    _piece = Piece(_char)
+    _table = tables[_piece.color][_piece.piece_type]
+    piece_square[_code] = [_piece.color.value * (_piece.piece_type.value + _table[sq >> 3][sq & 7]) for sq in range(64)]
+    phase_weights[_code] = _piece.piece_type.value
+enemy_king_square = [enemy_king_table[sq >> 3][sq & 7] for sq in range(64)]
+
+
+def evaluation_totals(squares):
+    # the piece square total and the total phase weight of the pieces, make_move keeps these up to date on the board
+    material = phase = 0
+    for sq, code in enumerate(squares):
+        if code:
+            material += piece_square[code][sq]
+            phase += phase_weights[code]
+    return material, phase
+
+
+def _offset_targets(offsets):
+    return [[(y + dy) * 8 + x + dx for dx, dy in offsets if 0 <= x + dx <= 7 and 0 <= y + dy <= 7]
+            for y in range(8) for x in range(8)]
+
+
+def _rays(directions):
+    rays = []
+    for sq in range(64):
+        rays.append([])
+        for dx, dy in directions:
+            x, y = (sq & 7) + dx, (sq >> 3) + dy
+            ray = []
+            while 0 <= x <= 7 and 0 <= y <= 7:
+                ray.append(y * 8 + x)
+                x += dx
+                y += dy
+            rays[sq].append(ray)
+    return rays
+
+
+# precomputed move tables, the squares are numbered y * 8 + x from the top left of the board
+knight_moves = _offset_targets([(2, -1), (2, 1), (1, -2), (1, 2), (-2, -1), (-2, 1), (-1, -2), (-1, 2)])
+king_moves = _offset_targets([(0, -1), (0, 1), (-1, 0), (1, 0), (1, -1), (-1, -1), (1, 1), (-1, 1)])
+rook_rays = _rays([(1, 0), (-1, 0), (0, 1), (0, -1)])
+bishop_rays = _rays([(1, -1), (-1, -1), (1, 1), (-1, 1)])
+# squares a pawn of each color captures on, white pawns move up the board
+pawn_captures = {1: _offset_targets([(-1, -1), (1, -1)]), -1: _offset_targets([(-1, 1), (1, 1)])}
+
+# castling rights, cleared when the king or rook leaves its square or a rook is captured on it
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+castle_masks = [15] * 64
+castle_masks[60] = 15 ^ (WHITE_KINGSIDE | WHITE_QUEENSIDE)
+castle_masks[63] = 15 ^ WHITE_KINGSIDE
+castle_masks[56] = 15 ^ WHITE_QUEENSIDE
+castle_masks[4] = 15 ^ (BLACK_KINGSIDE | BLACK_QUEENSIDE)
+castle_masks[7] = 15 ^ BLACK_KINGSIDE
+castle_masks[0] = 15 ^ BLACK_QUEENSIDE
+castle_chars = {"K": WHITE_KINGSIDE, "Q": WHITE_QUEENSIDE, "k": BLACK_KINGSIDE, "q": BLACK_QUEENSIDE}
+# rook squares, relative to the king's square, for each distance the king moves when castling
+castle_rooks = {2: (3, 1), -2: (-4, -1)}
+
+
+def square_name(sq):
+    return f"{chr((sq & 7) + 97)}{8 - (sq >> 3)}"
+
+
 def to_fen(board):
     string = ""
     count = 0
-    for row in board.pieces:
-        for piece in row:
-            if piece.image == "":
-                count += 1
-            else:
-                if count != 0:
-                    string += str(count)
-                    count = 0
-                string += piece.image
-        if count != 0:
-            string += str(count)
-            count = 0
-        string += "/"
+    for sq, code in enumerate(board.squares):
+        if code == EMPTY:
+            count += 1
+        else:
+            if count != 0:
+                string += str(count)
+                count = 0
+            string += chars_dict[code]
+        if sq & 7 == 7:
+            if count != 0:
+                string += str(count)
+                count = 0
+            string += "/"
     string = string[:-1] + " "
     if board.turn == 1:
         string += "w"
     else:
         string += "b"
 
-    return string
+    castling = "".join(char for char, right in castle_chars.items() if board.castling & right)
+    ep = square_name(board.ep) if board.ep != -1 else "-"
+    return f"{string} {castling or '-'} {ep} {board.half} {board.full}"
 
 
 def fen_converter(string):
-    pieces = []
-    row = []
-    row_num = 0
-    col_num = 0
+    squares = bytearray(64)
+    sq = 0
     for char in string:
         if char == "/":
-            pieces.append(row)
-            row = []
-            row_num += 1
-            col_num = 0
+            continue
         elif char.isdigit():
-            for _ in range(int(char)):
-                row.append(Piece())
-            col_num += int(char)
-
+            sq += int(char)
         else:
-            row.append(Piece(char, x=col_num, y=row_num))
-            col_num += 1
+            squares[sq] = codes_dict[char]
+            sq += 1
+    return squares
+
 
-    pieces.append(row)
-    return pieces
+def move_name(move):
+    name = square_name(move & 63) + square_name(move >> 6 & 63)
+    if move >> 12:
+        name += chars_dict[(move >> 12) | BLACK]
+    return name
 
 
 class Board:
     def __init__(self, depth=3, string=STRING):
         if depth == -1:  # if there is no AI
-            self.white_king = self.black_king = self.turn = self.half = self.full = self.source_coord = self.moved_to\
-                = self.highlighted_cells = self.check = self.quit = self.promote = self.ai = self.pieces = None
+            self.kings = self.turn = self.half = self.full = self.source_coord = self.moved_to = self.castling \
+                = self.ep = self.highlighted_cells = self.check = self.quit = self.promote = self.promoting = self.ai \
+                = self.squares = self.bitboards = self.occupied = self.key = self.material = self.phase = self.eval_cache \
+                = self.pawn_table = None
+            self.undo_stack = []
+            self.history = []
             return
         string = string.split()
-        self.pieces = fen_converter(string[0])
-        for y, row in enumerate(self.pieces):
-            for x, piece in enumerate(row):
-                if piece.piece_type is PieceType.King:
-                    if piece.color is PieceColor.White:
-                        self.white_king = (x, y)
-                    else:
-                        self.black_king = (x, y)
+        self.squares = fen_converter(string[0])
+        self.bitboards, self.occupied = board_bitboards(self.squares)
+        self.kings = [-1, -1]  # king squares, index 0 is white and 1 is black
+        for sq, code in enumerate(self.squares):
+            if code & 7 == KING:
+                self.kings[code >> 3] = sq
 
         # setting turns
         if len(string) == 1 or string[1] == "w":
@@ -147,39 +216,52 @@ class Board:
         else:
             self.turn = -1
 
-        # setting clocks
-        if len(string) == 1 or len(string) == 2:
-            self.half = 0
-            self.full = 0
+        # setting castling, en passant and clocks, an epd or short fen leaves off the fields at the end
+        if len(string) > 2:
+            self.castling = 0
+            for char in string[2]:
+                self.castling |= castle_chars.get(char, 0)
         else:
-            self.half = int(string[4])
-            self.full = int(string[5])
-
-            # setting castling
-            if string[2] == "-":
-                # no castling can happen
-                self.move_kings([PieceColor.White, PieceColor.Black])
-            else:
-                # castling can happen
-                if string[2].upper() == string[2]:  # lower case, white cannot castle
-                    self.move_kings([PieceColor.White])
-                elif string[2].lower() == string[2]:  # upper case, black cannot castle
-                    self.move_kings([PieceColor.Black])
+            self.castling = 15
+        if len(string) > 3 and string[3] != "-":
+            self.ep = (8 - int(string[3][1])) * 8 + ord(string[3][0]) - 97
+        else:
+            self.ep = -1
+        self.half = int(string[4]) if len(string) > 4 and string[4].isdigit() else 0
+        self.full = int(string[5]) if len(string) > 5 and string[5].isdigit() else 0
+
+        # castling can only happen if the king and rook are still on their starting squares
+        for sq, code in ((60, KING), (63, ROOK), (56, ROOK), (4, KING | BLACK), (7, ROOK | BLACK), (0, ROOK | BLACK)):
+            if self.squares[sq] != code:
+                self.castling &= castle_masks[sq]
+
+        self.key = compute_key(self)
+        self.history = [self.key]  # keys of every position so far, make_move adds to it and unmake_move takes off
+        self.material, self.phase = evaluation_totals(self.squares)
+        # caches evaluate uses if they are set, the search gives its boards these
+        self.eval_cache = None
+        self.pawn_table = None
 
         # setting default values
         self.source_coord = (-1, -1)
         self.moved_to = (-1, -1)
         self.highlighted_cells = set([])
-        self.check = False
-        self.quit = False
         self.promote = False
+        self.promoting = None
         self.ai = depth != 0
+        self.undo_stack = []
+        self.quit = False  # make_move keeps it, so it has to be set before legal_moves tries any moves
+        # the position can start in check, checkmate, stalemate or past the 50 move rule, half counts plies
+        self.check = -1 not in self.kings and self.attacked(self.kings[self.turn == -1], -self.turn)
+        self.quit = self.half >= 100 or not self.legal_moves()
+
+    @property
+    def pieces(self):
+        # 8x8 grid of Piece objects for code that still wants the old representation
+        return [[code_pieces[code] for code in self.squares[y * 8:y * 8 + 8]] for y in range(NUM_ROWS)]
 
-    def move_kings(self, colors):
-        for row in self.pieces:
-            for piece in row:
-                if piece.piece_type == PieceType.King and piece.color in colors:
-                    piece.moved = True
+    def piece_at(self, x, y):
+        return code_pieces[self.squares[y * 8 + x]]
 
     def click(self, xpos, ypos):
         xc = xpos // CLENGTH
@@ -193,28 +275,23 @@ class Board:
         x, y = self.source_coord
         # if there isn't a source cell
         if self.source_coord == (-1, -1):
-            if self.pieces[yc][xc].color.value is self.turn:  # if a cell with a piece is clicked
+            if self.piece_at(xc, yc).color.value is self.turn:  # if a cell with a piece is clicked
                 self.source_coord = (xc, yc)  # set the clicked piece as the source piece
                 self.highlight_cells(True)
-                '''
-                For each highlighted cell, make move
-                If after move, still in check
-                Remove move
-                '''
             else:
                 self.reset_source()
             return
 
         # if a pawn is being promoted
-        if y % 7 == 0 and self.pieces[y][x].piece_type == PieceType.Pawn:
+        if y % 7 == 0 and self.piece_at(x, y).piece_type == PieceType.Pawn:
             self.highlight_cells(True)
             if (xc, yc) not in self.highlighted_cells:
                 return
 
-            self.move_piece(xc, yc, True)
+            self.move_piece(xc, yc)
 
         if not self.promote and (xc, yc) in self.highlighted_cells:
-            self.move_piece(xc, yc, True)
+            self.move_piece(xc, yc)
 
         with open("game.txt", "a") as file:
             file.write(to_fen(self) + "\n")
@@ -223,9 +300,9 @@ class Board:
                 line = ""
             else:
                 if self.turn == 1:
-                    line = f"{self.pieces[yc][xc].image}{chr(xc + 97)}{8 - yc} "
+                    line = f"{self.piece_at(xc, yc).image}{chr(xc + 97)}{8 - yc} "
                 else:
-                    line = f"{self.full}.{self.pieces[yc][xc].image}{chr(xc + 97)}{8 - yc} "
+                    line = f"{self.full}.{self.piece_at(xc, yc).image}{chr(xc + 97)}{8 - yc} "
                     self.full += 1
             file.write(line)
 
@@ -234,323 +311,336 @@ class Board:
 
     def highlight_cells(self, recur=False):
         x, y = self.source_coord
-        if self.promote and self.pieces[y][x].piece_type is PieceType.Pawn and y % 7 == 0:
+        if self.promote and self.squares[y * 8 + x] & 7 == PAWN and y % 7 == 0:
             self.highlighted_cells = set([(i, 8) for i in range(4)])
             return False
-        self.highlighted_cells = set([])
-        if self.pieces[y][x].piece_type is PieceType.Pawn:
-            self.highlight_pawn()
-        elif self.pieces[y][x].piece_type is PieceType.Bishop:
-            self.highlight_bishop()
-        elif self.pieces[y][x].piece_type is PieceType.Knight:
-            self.highlight_knight()
-        elif self.pieces[y][x].piece_type is PieceType.Rook:
-            self.highlight_rook()
-        elif self.pieces[y][x].piece_type is PieceType.Queen:
-            self.highlight_queen()
-        elif self.pieces[y][x].piece_type is PieceType.King:
-            self.highlight_king()
-
+        sq = y * 8 + x
         if recur:
-            new_moves = set([])
-            for move in self.highlighted_cells:
-                new_board = self.copy_board()
-                new_board.move_piece(*move)
-                if not new_board.is_check():
-                    new_moves.add(move)
-            self.highlighted_cells = new_moves
+            targets = [move >> 6 & 63 for move in self.legal_moves(sq)]
+        else:
+            targets = self.targets(sq)
+        self.highlighted_cells = set([(target & 7, target >> 3) for target in targets])
         self.highlighted_cells.discard((x, y))
 
-    def highlight_pawn(self):
-        x, y = self.source_coord
+    def targets(self, sq):
+        # squares the piece on sq can move to, without looking at checks
+        targets = []
+        kind = self.squares[sq] & 7
+        if kind == PAWN:
+            self.highlight_pawn(sq, targets)
+        elif kind == BISHOP:
+            self.highlight_bishop(sq, targets)
+        elif kind == KNIGHT:
+            self.highlight_knight(sq, targets)
+        elif kind == ROOK:
+            self.highlight_rook(sq, targets)
+        elif kind == QUEEN:
+            self.highlight_queen(sq, targets)
+        elif kind == KING:
+            self.highlight_king(sq, targets)
+        return targets
+
+    def highlight_pawn(self, sq, targets):
+        squares = self.squares
+        y = sq >> 3
         if y % 7 == 0:
             return
+        color = squares[sq] & BLACK
+        step = 8 if color else -8
         # if the piece in front is empty add that cell
-        if self.pieces[y - self.turn][x].color.value == 0:
-            self.highlighted_cells.add((x, y - self.turn))
-
-        # if the pawn hasn't moved, let it move 2 moves forward
-        if not self.pieces[y][x].moved and \
-                self.pieces[y - 2 * self.turn][x].color.value == self.pieces[y - self.turn][x].color.value == 0:
-            self.highlighted_cells.add((x, y - 2 * self.turn))
+        if not squares[sq + step]:
+            targets.append(sq + step)
+            # if the pawn hasn't moved, let it move 2 moves forward
+            if y == (1 if color else 6) and not squares[sq + 2 * step]:
+                targets.append(sq + 2 * step)
 
         # if the piece to the left and right corner are opposite color, add them to highlighted piece
-        # left hand side
-        if x != 0:
-            if self.pieces[y - self.turn][x - 1].color.value == self.turn * -1:
-                self.highlighted_cells.add((x - 1, y - self.turn))
-
-        # right hand side
-        if x != 7:
-            if self.pieces[y - self.turn][x + 1].color.value == self.turn * -1:
-                self.highlighted_cells.add((x + 1, y - self.turn))
-
-    def highlight_bishop(self):
-        directions = [(1, -1), (-1, -1), (1, 1), (-1, 1)]
-        for direction in directions:
-            self.check_direction(*direction)
-
-    def highlight_knight(self):
-        possible_moves = [(2, -1), (2, 1), (1, -2), (1, 2), (-2, -1), (-2, 1), (-1, -2), (-1, 2)]
-        for move in possible_moves:
-            self.check_cell(*move)
-
-    def highlight_queen(self):
-        self.highlight_rook()
-        self.highlight_bishop()
-
-    def highlight_rook(self):
-        directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-        for direction in directions:
-            self.check_direction(*direction)
-
-    def check_direction(self, d2x, d2y):
-        dx = d2x
-        dy = d2y
-        x, y = self.source_coord
-        while True:
-            if not (0 <= x + dx <= 7 and 0 <= y + dy <= 7):
+        for target in pawn_captures[-1 if color else 1][sq]:
+            if squares[target] and squares[target] & BLACK != color:
+                targets.append(target)
+            elif target == self.ep and (self.turn == -1) == (color == BLACK):  # en passant
+                targets.append(target)
+
+    def highlight_bishop(self, sq, targets):
+        for ray in bishop_rays[sq]:
+            self.check_direction(sq, ray, targets)
+
+    def highlight_knight(self, sq, targets):
+        color = self.squares[sq] & BLACK
+        for target in knight_moves[sq]:
+            self.check_cell(target, color, targets)
+
+    def highlight_queen(self, sq, targets):
+        self.highlight_rook(sq, targets)
+        self.highlight_bishop(sq, targets)
+
+    def highlight_rook(self, sq, targets):
+        for ray in rook_rays[sq]:
+            self.check_direction(sq, ray, targets)
+
+    def check_direction(self, sq, ray, targets):
+        squares = self.squares
+        color = squares[sq] & BLACK
+        for target in ray:
+            if squares[target]:
+                if squares[target] & BLACK != color:
+                    targets.append(target)
                 return
-            if self.pieces[y + dy][x + dx].color.value is self.turn * -1:
-                self.highlighted_cells.add((x + dx, y + dy))
-                return
-            elif self.pieces[y + dy][x + dx].color.value is self.turn:
-                return
-            else:
-                self.highlighted_cells.add((x + dx, y + dy))
-                dx += d2x
-                dy += d2y
+            targets.append(target)
+
+    def highlight_king(self, sq, targets):
+        squares = self.squares
+        color = squares[sq] & BLACK
+        for target in king_moves[sq]:
+            self.check_cell(target, color, targets)
+
+        rights = self.castling >> 2 if color else self.castling
+        enemy = 1 if color else -1
+        # no castling out of check or through an attacked square, moving into check is left to legal_moves
+        if not rights or self.attacked(sq, enemy):
+            return
+        # add castling to right
+        if rights & 1 and squares[sq + 3] == ROOK | color and not squares[sq + 1] and not squares[sq + 2] and \
+                not self.attacked(sq + 1, enemy):
+            targets.append(sq + 2)
 
-    def highlight_king(self):
-        directions = [(0, -1), (0, 1), (-1, 0), (1, 0), (1, -1), (-1, -1), (1, 1), (-1, 1)]
-        for direction in directions:
-            self.check_cell(*direction)
+        if rights & 2 and squares[sq - 4] == ROOK | color and \
+                not squares[sq - 1] and not squares[sq - 2] and not squares[sq - 3] and not self.attacked(sq - 1, enemy):
+            targets.append(sq - 2)
 
-        x, y = self.source_coord
-        # add castling to right
-        if self.check:  # no castling allowed if in check
-            return
-        if self.pieces[y][x].moved:
-            return  # no castling allowed if king has moved
-
-        if not self.pieces[y][7].moved and \
-                self.pieces[y][7].piece_type == PieceType.Rook and \
-                self.pieces[y][7].color.value == self.turn and \
-                (self.pieces[y][x + 1].color.value == self.pieces[y][x + 2].color.value == 0):
-            self.highlighted_cells.add((x + 2, y))
-
-        if not self.pieces[y][0].moved and \
-                self.pieces[y][0].piece_type == PieceType.Rook and \
-                self.pieces[y][0].color.value == self.turn and \
-                (self.pieces[y][x - 1].color.value ==
-                 self.pieces[y][x - 2].color.value ==
-                 self.pieces[y][x - 3].color.value == 0):
-            self.highlighted_cells.add((x - 2, y))
-            self.highlighted_cells.add((x - 3, y))
-
-    def check_cell(self, dx, dy):
-        x, y = self.source_coord
-        if not (0 <= y + dy <= 7 and 0 <= x + dx <= 7):
-            return
-        if self.pieces[y + dy][x + dx].color.value is not self.turn:
-            self.highlighted_cells.add((x + dx, y + dy))
+    def check_cell(self, target, color, targets):
+        code = self.squares[target]
+        if not code or code & BLACK != color:
+            targets.append(target)
 
     def reset_source(self):
         self.source_coord = (-1, -1)
         self.highlighted_cells = set([])
 
-    def move_piece(self, x, y, first=False):
-        self.moved_to = (x, y)
+    def generate_moves(self, source=None):
+        # moves for the side to move as ints, from | to << 6 | promotion piece << 12, without looking at checks
+        if source is None:
+            return generate_moves(self)
+        moves = []
+        squares = self.squares
+        color = BLACK if self.turn == -1 else 0
+        code = squares[source]
+        if not code or code & BLACK != color:
+            return moves
+        for target in self.targets(source):
+            if code & 7 == PAWN and target >> 3 in (0, 7):
+                for promotion in promotion_pieces:
+                    moves.append(source | target << 6 | promotion << 12)
+            else:
+                moves.append(source | target << 6)
+        return moves
+
+    def legal_moves(self, source=None, captures=False):
+        # with captures set only captures and promotions
+        moves = legal_moves(self, captures)
+        if source is not None:
+            moves = [move for move in moves if move & 63 == source]
+        return moves
 
+    def move_piece(self, x, y):
         px, py = self.source_coord
 
-        if self.pieces[py][px].piece_type == PieceType.Pawn and y % 7 == 0 and first:
+        if self.promote:
+            # (x, 8) picks the piece the pawn waiting on (px, py) turns into
+            source, captured = self.promoting
+            to = py * 8 + px
+            self.squares[source] = self.squares[to]
+            self.squares[to] = captured
+            self.promote = False
+            self.moved_to = (px, py)
+            self.highlighted_cells = set([])
+            self.make_move(source | to << 6 | promotion_pieces[x] << 12, played=True)
+            return
+
+        source = py * 8 + px
+        to = y * 8 + x
+        self.moved_to = (x, y)
+        if self.squares[source] & 7 == PAWN and y % 7 == 0:
             # wait for input from user asking which piece to turn into
-            self.pieces[y][x] = self.pieces[py][px]
-            self.pieces[py][px] = Piece()
+            self.promoting = (source, self.squares[to])
+            self.squares[to] = self.squares[source]
+            self.squares[source] = EMPTY
             self.source_coord = (x, y)
             self.promote = True
             self.highlight_cells(True)
             return
 
-        if self.promote:
-            if x == 0:
-                promoting_piece = "R"
-            elif x == 1:
-                promoting_piece = "N"
-            elif x == 2:
-                promoting_piece = "B"
-            elif x == 3:
-                promoting_piece = "Q"
-            if self.turn == -1:
-                promoting_piece = promoting_piece.lower()
-            self.pieces[py][px] = Piece(string=promoting_piece)
-            self.pieces[py][px].moved = True
-            self.promote = False
-
-            current = self.source_coord
-            self.check = self.is_check(None, (px, py))
-            self.source_coord = current
-
-        else:
-            # castling
-            if self.pieces[py][px].piece_type == PieceType.King:
-                if self.turn == 1:
-                    self.white_king = (x, y)
-                else:
-                    self.black_king = (x, y)
-                if abs((d := x - px)) == 2:
-                    d //= 2
-                    rookx = max([0, d]) * 7
-                    self.pieces[y][px + d] = self.pieces[y][rookx]
-                    self.pieces[y][px + d].moved = True
-                    self.pieces[y][rookx] = Piece()
-
-                elif px - x == 3:
-                    self.pieces[y][2] = self.pieces[y][0]
-                    self.pieces[y][2].moved = True
-                    self.pieces[y][0] = Piece()
-
-            if self.pieces[y][x].piece_type != PieceType.Empty or self.pieces[py][px].piece_type == PieceType.Pawn:
-                self.half = 0
-            self.pieces[y][x] = self.pieces[py][px]
-            self.pieces[y][x].moved = True
-            self.pieces[py][px] = Piece()  # set the source piece to 0
-
-            current = self.source_coord
-            self.check = self.is_check((px, py), (x, y))
-            self.source_coord = current
+        self.make_move(source | to << 6, played=True)
+
+    def make_move(self, move, first=False, played=False):
+        # first is set for moves actually played or searched, these also work out check and checkmate
+        # played moves also look for stalemate, the search finds that itself when a position has no moves
+        squares = self.squares
+        source = move & 63
+        to = move >> 6 & 63
+        promotion = move >> 12
+        piece = squares[source]
+        captured = squares[to]
+        self.undo_stack.append((move, piece, captured, self.turn, self.castling, self.ep, self.half, self.check,
+                                self.quit, self.key, self.material, self.phase))
+
+        moved = promotion | piece & BLACK if promotion else piece
+        squares[to] = moved
+        squares[source] = EMPTY
+        bitboards = self.bitboards
+        side = piece >> 3
+        key = self.key
+        material = self.material + piece_square[moved][to] - piece_square[piece][source]
+        if captured:
+            bitboards[captured] ^= 1 << to
+            self.occupied[side ^ 1] ^= 1 << to
+            key ^= piece_keys[captured][to]
+            material -= piece_square[captured][to]
+            self.phase -= phase_weights[captured]
+        if promotion:
+            self.phase += phase_weights[moved] - phase_weights[piece]
+        bitboards[piece] ^= 1 << source
+        bitboards[moved] ^= 1 << to
+        self.occupied[side] ^= 1 << source | 1 << to
+        key ^= piece_keys[piece][source] ^ piece_keys[moved][to]
+        kind = piece & 7
+        if kind == PAWN and to == self.ep:
+            # en passant, the captured pawn is beside the pawn's starting square
+            behind = source & ~7 | to & 7
+            pawn = squares[behind]
+            squares[behind] = EMPTY
+            bitboards[pawn] ^= 1 << behind
+            self.occupied[side ^ 1] ^= 1 << behind
+            key ^= piece_keys[pawn][behind]
+            material -= piece_square[pawn][behind]
+            self.phase -= phase_weights[pawn]
+        elif kind == KING:
+            self.kings[side] = to
+            if to - source in castle_rooks:
+                rook_from, rook_to = castle_rooks[to - source]
+                self.move_rook(source + rook_from, source + rook_to)
+                rook = ROOK | piece & BLACK
+                key ^= piece_keys[rook][source + rook_from] ^ piece_keys[rook][source + rook_to]
+                material += piece_square[rook][source + rook_to] - piece_square[rook][source + rook_from]
+        self.material = material
+        key ^= castling_keys[self.castling] ^ ep_keys[self.ep]
+        self.castling &= castle_masks[source] & castle_masks[to]
+        self.ep = (source + to) >> 1 if kind == PAWN and abs(to - source) == 16 else -1
+        self.key = key ^ castling_keys[self.castling] ^ ep_keys[self.ep] ^ turn_key
+        self.history.append(self.key)
+
+        # plies since the last capture or pawn move, like the fen's halfmove clock
+        self.half = 0 if captured or kind == PAWN else self.half + 1
+        if self.half >= 100:
+            self.quit = True
 
+        if first or played:
+            self.check = self.attacked(self.kings[self.turn == 1], self.turn)
         self.turn *= -1
-        self.half += 1
-        if self.half == 50:
+        if (self.check and first or played) and not self.legal_moves():
             self.quit = True
-
-        if self.check and first:
-            self.check_checkmate()
-            self.source_coord = current
-
-
-        '''
-        If king is under attack, check
-        For each piece
-            Select piece
-            If king is in highlighted cells
-                check = True
-                break 
-        For each move opponent can make
-            Make move
-            If not in check anymore:
-                break
-        else:
-            checkmate, end the game
-        
-        '''
-
-    def check_checkmate(self):
-        for row_num in range(NUM_ROWS):
-            for col_num in range(NUM_ROWS):
-                if self.pieces[row_num][col_num].color.value is not self.turn:
-                    continue
-                self.source_coord = (col_num, row_num)
-                self.highlight_cells(True)
-                if self.highlighted_cells != set([]):
-                    return
-        self.quit = True
-
-    def knight_check(self, prev, move):
-        sx, sy = tuple(add(prev, move))
-        if 0 <= sx <= 7 and 0 <= sy <= 7:
-            piece = self.pieces[sy][sx]
-            if piece.piece_type is PieceType.Knight and piece.color.value is self.turn:
-                return True
-        return False
-
-    def line_check(self, king, prev, direction):
-        cx, cy = self.source_coord = add(prev, direction)
-        while 0 <= cx <= 7 and 0 <= cy <= 7:
-            if self.pieces[cy][cx].color.value == self.turn * -1:
-                return False
-            if self.pieces[cy][cx].color.value != 0:
-                self.highlight_cells()
-                if king in self.highlighted_cells:
-                    return True
-                return False
-            cx, cy = self.source_coord = add(self.source_coord, direction)
-
-        return False
-
-    def is_check(self, prev=None, current=None):
-        if self.turn == 1:
-            king = self.black_king
-        else:
-            king = self.white_king
-        if prev is None:
-            prev = king
-
-        if current is not None:
-            # check if piece moved puts in check
-            self.source_coord = current
-            self.highlight_cells()
-            if king in self.highlighted_cells:
-                return True
-        else:
-            knight_move = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
-            for move in knight_move:
-                if self.knight_check(prev, move):
-                    return True
-
-        px, py = prev
-        # check column
-        if king[0] == px:
-            for y, piece in enumerate([row[px] for row in self.pieces]):
-                if piece.color.value is not self.turn:
-                    continue
-                self.source_coord = (px, y)
-                self.highlight_cells()
-                if king in self.highlighted_cells:
-                    return True
-
-        # check row
-        if king[1] == py:
-            for x, piece in enumerate(self.pieces[py]):
-                if piece.color.value is not self.turn:
-                    continue
-                self.source_coord = (x, py)
-                self.highlight_cells()
-                if king in self.highlighted_cells:
-                    return True
-
-        directions = [(1, -1), (-1, -1), (1, 1), (-1, 1)]
-        for direction in directions:
-            if self.line_check(king, prev, direction):
-                return True
-        return False
+        if played and self.repetitions() >= 2:
+            self.quit = True  # threefold repetition
+
+    def unmake_move(self):
+        move, piece, captured, self.turn, self.castling, self.ep, self.half, self.check, self.quit, self.key, \
+            self.material, self.phase = self.undo_stack.pop()
+        self.history.pop()
+        squares = self.squares
+        source = move & 63
+        to = move >> 6 & 63
+        promotion = move >> 12
+        squares[source] = piece
+        squares[to] = captured
+        moved = promotion | piece & BLACK if promotion else piece
+        bitboards = self.bitboards
+        side = piece >> 3
+        bitboards[moved] ^= 1 << to
+        bitboards[piece] ^= 1 << source
+        self.occupied[side] ^= 1 << source | 1 << to
+        if captured:
+            bitboards[captured] ^= 1 << to
+            self.occupied[side ^ 1] ^= 1 << to
+        if piece & 7 == PAWN and to == self.ep:
+            behind = source & ~7 | to & 7
+            pawn = PAWN | piece & BLACK ^ BLACK
+            squares[behind] = pawn
+            bitboards[pawn] ^= 1 << behind
+            self.occupied[side ^ 1] ^= 1 << behind
+        elif piece & 7 == KING:
+            self.kings[side] = source
+            if to - source in castle_rooks:
+                rook_from, rook_to = castle_rooks[to - source]
+                self.move_rook(source + rook_to, source + rook_from)
+
+    def move_rook(self, source, to):
+        # the rook half of castling
+        rook = self.squares[source]
+        self.squares[to] = rook
+        self.squares[source] = EMPTY
+        self.bitboards[rook] ^= 1 << source | 1 << to
+        self.occupied[rook >> 3] ^= 1 << source | 1 << to
+
+    def attacked(self, sq, color):
+        # True if a piece of color (1 white, -1 black) attacks sq
+        return attackers(self, sq, color == -1, self.occupied[0] | self.occupied[1]) != 0
+
+    def checkmated(self):
+        # a game can also end in check by the 50 move rule or a repetition, only no moves out of check is a loss
+        return self.check and not self.legal_moves()
 
     def evaluate(self):
         if self.quit:
-            if self.check:
+            if self.checkmated():
                 return self.turn * -9999999
             return 0
 
-        e = 0
-        t = 48000
-        for y, row in enumerate(self.pieces):
-            for x, piece in enumerate(row):
-                if piece.color.value == 0: continue
-                weight = tables[piece.color][piece.piece_type][y][x]
-                e += piece.color.value * (piece.piece_type.value + weight)
-                t -= abs(piece.piece_type.value)
-        if self.turn == 1:
-            kx, ky = self.black_king
-        else:
-            kx, ky = self.white_king
+        cache = self.eval_cache
+        if cache is not None:
+            e = cache.probe(self.key)
+            if e is not None:
+                return e
+
+        # the totals over every piece are kept up to date by make_move
+        e = self.material
+        t = 48000 - self.phase
+        king = self.kings[self.turn == 1]  # the king of the side that isn't moving
         e = (e*(8000-t))//8000  # weighting of pieces lowers as game progresses
-        e += (enemy_king_table[ky][kx] * t * self.turn) // 8000  # weighting of kings increase as game progresses
+        e += (enemy_king_square[king] * t * self.turn) // 8000  # weighting of kings increase as game progresses
+        e += self.pawn_score()
 
+        if cache is not None:
+            cache.store(self.key, e)
         return e
 
+    def pawn_score(self):
+        # the pawn structure only changes when a pawn moves or is taken, so the pawn table usually has it
+        white = self.bitboards[PAWN]
+        black = self.bitboards[PAWN | BLACK]
+        table = self.pawn_table
+        if table is not None:
+            score = table.probe(white, black)
+            if score is not None:
+                return score
+        score = pawn_structure(white, black)
+        if table is not None:
+            table.store(white, black, score)
+        return score
+
+    def repetitions(self):
+        # times the position has been seen before, only positions since the last capture or pawn move can repeat and
+        # only every other one has the same side to move
+        history = self.history
+        key = history[-1]
+        return sum(1 for i in range(len(history) - 3, max(len(history) - 1 - self.half, 0) - 1, -2)
+                   if history[i] == key)
+
     def copy_board(self):
         new_board = copy(self)
-        new_board.pieces = [[Piece(piece=piece) for piece in row] for row in self.pieces]
+        new_board.squares = bytearray(self.squares)
+        new_board.bitboards = self.bitboards[:]
+        new_board.occupied = self.occupied[:]
+        new_board.kings = self.kings[:]
+        new_board.undo_stack = []
+        new_board.history = self.history[:]
         return new_board
@@ -0,0 +1,146 @@
+from board import Board, square_name
+from constants import STRING
+from pieces import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+
+# each entry is the position key, a move played from it and the move's weight, sorted by key then move
+ENTRY = struct.Struct("<QHH")
+BOOK_PLIES = 20  # moves from each game that go in the book
+MIN_WEIGHT = 2  # moves played fewer times than this are left out
+
+san_letters = {KNIGHT: "N", BISHOP: "B", ROOK: "R", QUEEN: "Q", KING: "K"}
+results = {"1-0", "0-1", "1/2-1/2", "*"}
+
+
+class Book:
+    def __init__(self, path):
+        # the file is memory mapped and searched where it is, none of it is read into python objects
+        self.file = open(path, "rb")
+        self.size = os.path.getsize(path) // ENTRY.size
+        self.memory = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.random = random.Random()
+
+    def entries(self, key):
+        # (move, weight) for every move stored for the key
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(self.memory, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self.size:
+            entry_key, move, weight = ENTRY.unpack_from(self.memory, low * ENTRY.size)
+            if entry_key != key:
+                break
+            found.append((move, weight))
+            low += 1
+        return found
+
+    def probe(self, board):
+        # a legal book move for the position picked at random by weight, or None
+        legal = board.legal_moves()
+        found = [(move, weight) for move, weight in self.entries(board.key) if move in legal]
+        if not found:
+            return None
+        return self.random.choices([move for move, _ in found], [weight for _, weight in found])[0]
+
+    def close(self):
+        if self.memory is not None:
+            self.memory.close()
+        self.file.close()
+
+
+def san(board, move, legal=None):
+    # the move in standard algebraic notation without check marks, like Nbd2, exd5, e8=Q or O-O
+    source = move & 63
+    to = move >> 6 & 63
+    kind = board.squares[source] & 7
+    if kind == KING and abs(to - source) == 2:
+        return "O-O" if to > source else "O-O-O"
+    capture = board.squares[to] or kind == PAWN and to == board.ep
+    if kind == PAWN:
+        name = (square_name(source)[0] + "x" if capture else "") + square_name(to)
+        if move >> 12:
+            name += "=" + san_letters[move >> 12]
+        return name
+    # other pieces of the same kind that can move to the same square
+    others = [other & 63 for other in (legal if legal is not None else board.legal_moves())
+              if other >> 6 & 63 == to and other & 63 != source and board.squares[other & 63] & 7 == kind]
+    name = san_letters[kind]
+    if others:
+        if all(other & 7 != source & 7 for other in others):
+            name += square_name(source)[0]
+        elif all(other >> 3 != source >> 3 for other in others):
+            name += square_name(source)[1]
+        else:
+            name += square_name(source)
+    return name + ("x" if capture else "") + square_name(to)
+
+
+def parse_san(board, text):
+    # the legal move the san names, or None
+    text = text.rstrip("+#!?").replace("0", "O")
+    legal = board.legal_moves()
+    for move in legal:
+        if san(board, move, legal) == text:
+            return move
+    return None
+
+
+def read_games(path):
+    # the move text of every game in a pgn file, with the comments, variations, move numbers and results taken out
+    # games that start from their own position are skipped
+    with open(path, "r", errors="replace") as file:
+        text = file.read()
+    for game in re.split(r"\n\s*\n(?=\[)", text):
+        if "[FEN " in game:
+            continue
+        moves = "\n".join(line for line in game.splitlines() if not line.startswith("["))
+        moves = re.sub(r"\{[^}]*\}|;[^\n]*|\$\d+", " ", moves)
+        while "(" in moves:
+            stripped = re.sub(r"\([^()]*\)", " ", moves)
+            if stripped == moves:
+                break
+            moves = stripped
+        yield [token for token in re.sub(r"\d+\.+", " ", moves).split() if token not in results]
+
+
+def build(directory, path, plies=BOOK_PLIES, min_weight=MIN_WEIGHT):
+    # makes a book from the first plies moves of every game in the directory's pgn files, a move's weight is the
+    # number of games it was played in, returns the number of entries written
+    counts = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(".pgn"):
+            continue
+        for game in read_games(os.path.join(directory, name)):
+            board = Board(string=STRING)
+            for text in game[:plies]:
+                move = parse_san(board, text)
+                if move is None:
+                    break  # a move that isn't legal here, the rest of the game can't be followed
+                counts[board.key, move] = counts.get((board.key, move), 0) + 1
+                board.make_move(move, played=True)
+                if board.quit:
+                    break
+    entries = sorted((key, move, min(count, 0xFFFF)) for (key, move), count in counts.items() if count >= min_weight)
+    with open(path, "wb") as file:
+        for entry in entries:
+            file.write(ENTRY.pack(*entry))
+    return len(entries)
+
+
+if __name__ == "__main__":
+    # python book.py <pgn directory> <book file> [plies] [min weight], then the book's moves from the start position
+    directory, path = sys.argv[1], sys.argv[2]
+    print(f"{build(directory, path, *map(int, sys.argv[3:5]))} entries")
+    book = Book(path)
+    board = Board(string=STRING)
+    print(" ".join(f"{san(board, move)} {weight}" for move, weight in book.entries(board.key)))
+    book.close()
@@ -0,0 +1,65 @@
+from array import array
+
+SCORE_OFFSET = 1 << 31  # scores are stored unsigned
+
+
+class EvalCache:
+    def __init__(self, size=4):
+        # size is the memory budget in MB, each 16 byte entry is the position key and the score it was evaluated to
+        self.size = size
+        self.slots = max(1, size * 1024 * 1024 // 16)
+        self.entries = array("Q", bytes(self.slots * 16))
+        self.probes = self.hits = 0
+
+    def probe(self, key):
+        # the score stored for the key, or None
+        self.probes += 1
+        i = key % self.slots * 2
+        if self.entries[i] == key and self.entries[i + 1]:
+            self.hits += 1
+            return self.entries[i + 1] - SCORE_OFFSET
+        return None
+
+    def store(self, key, score):
+        i = key % self.slots * 2
+        self.entries[i] = key
+        self.entries[i + 1] = score + SCORE_OFFSET
+
+    def reset_stats(self):
+        self.probes = self.hits = 0
+
+    def clear(self):
+        self.entries = array("Q", bytes(self.slots * 16))
+        self.reset_stats()
+
+
+class PawnTable:
+    def __init__(self, size=1):
+        # size is the memory budget in MB, each 24 byte entry is the white and black pawn bitboards then the score
+        # of their pawn structure, the bitboards are the whole key so there are no false hits
+        self.size = size
+        self.slots = max(1, size * 1024 * 1024 // 24)
+        self.entries = array("Q", bytes(self.slots * 24))
+        self.probes = self.hits = 0
+
+    def probe(self, white, black):
+        self.probes += 1
+        i = hash((white, black)) % self.slots * 3
+        entries = self.entries
+        if entries[i] == white and entries[i + 1] == black and entries[i + 2]:
+            self.hits += 1
+            return entries[i + 2] - SCORE_OFFSET
+        return None
+
+    def store(self, white, black, score):
+        i = hash((white, black)) % self.slots * 3
+        self.entries[i] = white
+        self.entries[i + 1] = black
+        self.entries[i + 2] = score + SCORE_OFFSET
+
+    def reset_stats(self):
+        self.probes = self.hits = 0
+
+    def clear(self):
+        self.entries = array("Q", bytes(self.slots * 24))
+        self.reset_stats()
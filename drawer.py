@@ -35,9 +35,10 @@ class Drawer:
             self.pygame.draw.rect(self.win, color, [coord[0] * CLENGTH, coord[1] * CLENGTH, CLENGTH, CLENGTH])
 
     def draw_pieces(self, board):
+        pieces = board.pieces
         for row_num in range(NUM_ROWS):
             for col_num in range(NUM_ROWS):
-                self.draw_piece(board.pieces[row_num][col_num], col_num, row_num)
+                self.draw_piece(pieces[row_num][col_num], col_num, row_num)
 
     def draw_promoting(self):
         for i, p in enumerate(["rook", "knight", "bishop", "queen"]):
@@ -5,6 +5,7 @@ from constants import *
 import pyperclip
 from ai import AI
 import json
+import os
 
 
 def fen_check(string):
@@ -44,7 +45,16 @@ def main():
                 "bcolor": [179, 0, 255],
                 "bcolor2": [217, 128, 255],
                 "mtcolor": [255, 0, 0],
-                "fps": 60
+                "fps": 60,
+                "hash": 16,
+                "eval_hash": 4,
+                "pawn_hash": 1,
+                "movetime": 0,
+                "workers": 0,
+                "profile": False,
+                "log": "",
+                "book": "book.bin",
+                "tablebases": "tablebases"
                 }
 
     try:
@@ -53,6 +63,68 @@ def main():
         depth = 4
         data["depth"] = depth
 
+    try:
+        hash_size = data["hash"]
+    except KeyError:
+        hash_size = 16
+        data["hash"] = hash_size
+
+    # sizes in MB of the evaluation cache and pawn table each search worker keeps
+    try:
+        eval_size = data["eval_hash"]
+    except KeyError:
+        eval_size = 4
+        data["eval_hash"] = eval_size
+
+    try:
+        pawn_size = data["pawn_hash"]
+    except KeyError:
+        pawn_size = 1
+        data["pawn_hash"] = pawn_size
+
+    try:
+        movetime = data["movetime"]
+    except KeyError:
+        movetime = 0
+        data["movetime"] = movetime
+
+    try:
+        workers = data["workers"]
+    except KeyError:
+        workers = 0
+        data["workers"] = workers
+
+    # profile adds detailed counters to the AI's statistics, with a log file name they are saved there as json
+    try:
+        profile = data["profile"]
+    except KeyError:
+        profile = False
+        data["profile"] = profile
+
+    try:
+        log = data["log"]
+    except KeyError:
+        log = ""
+        data["log"] = log
+
+    # opening book file made by book.py, the AI plays without one if it doesn't exist
+    try:
+        book = data["book"]
+    except KeyError:
+        book = "book.bin"
+        data["book"] = book
+    if not os.path.isfile(book):
+        book = None
+
+    # directory of endgame tables made by tablebase.py
+    try:
+        tablebases = data["tablebases"]
+    except KeyError:
+        tablebases = "tablebases"
+        data["tablebases"] = tablebases
+    if not os.path.isdir(tablebases):
+        tablebases = None
+
     try:
         fps = data["fps"]
     except KeyError:
@@ -115,7 +187,9 @@ def main():
 
     settings = [
         Button(300, 200, 50, 50, 4, "-", button_color, highlight_button_color),  # decrease depth
-        Button(400, 200, 50, 50, 5, "+", button_color, highlight_button_color)  # increase depth
+        Button(400, 200, 50, 50, 5, "+", button_color, highlight_button_color),  # increase depth
+        Button(300, 300, 50, 50, 10, "-", button_color, highlight_button_color),  # decrease move time
+        Button(400, 300, 50, 50, 11, "+", button_color, highlight_button_color)  # increase move time
     ]
 
     end = Button(100, 100, 450, 50, 9, "", button_color, highlight_button_color)
@@ -136,6 +210,8 @@ def main():
     # 7 ... new game vs ai with fen
     # 8 ... new game vs player with fen
     # 9 ... end of game
+    # 10 ... -1 second move time
+    # 11 ... +1 second move time
 
     # game loop
     while running:
@@ -177,18 +253,27 @@ def main():
                 continue
             if board.quit:
                 end.text = "Game has ended"
-                if board.check:
+                if board.checkmated():
                     if board.turn == -1:
                         end.text += ". White has won"
                     else:
                         end.text += ". Black has won"
+                elif board.half >= 100:
+                    end.text += " in a draw. 50 move rule"
+                elif board.repetitions() >= 2:
+                    end.text += " in a draw. threefold repetition"
                 else:
                     end.text += " in stalemate"
-                    if board.half == 50:
-                        end.text += ". 50 move rule"
+
+                if ai is not None:
+                    ai.cancel()  # stops pondering once the game is over
 
             elif board.turn == -1 and board.ai:
-                ai.move(board)
+                # the search runs in the AI's worker processes so the window keeps drawing while it thinks
+                ai.begin(board)
+                if ai.ready():
+                    ai.play(board, ai.result())
+                    ai.ponder(board)  # keeps searching on the player's time
 
             for event in pygame.event.get():
                 pos = pygame.mouse.get_pos()
@@ -196,9 +281,12 @@ def main():
                     running = False
 
                 if event.type == pygame.MOUSEBUTTONUP:
-                    board.click(*pos)
+                    if not (board.ai and board.turn == -1):  # the board can't be touched while the AI is thinking
+                        board.click(*pos)
 
                     if _quit.click(*pos) == 2:
+                        if ai is not None:
+                            ai.cancel()
                         option = 0
 
                 _quit.check_hover(*pos)
@@ -210,15 +298,20 @@ def main():
 
         # New game
         elif option in (1, 6, 7, 8):
+            if ai is not None:
+                ai.close()  # stops the old search workers
+                ai = None
             if option == 1:
                 board = Board(depth=depth)
-                ai = AI(depth)
+                ai = AI(depth, hash_size, movetime, workers=workers, profile=profile, log=log,
+                        eval_size=eval_size, pawn_size=pawn_size, book=book, tablebases=tablebases)
             elif option == 6:
                 board = Board(depth=0)
             elif option == 7:
                 if fen_check((string := pyperclip.paste())):
                     board = Board(string=string, depth=depth)
-                    ai = AI(depth)
+                    ai = AI(depth, hash_size, movetime, workers=workers, profile=profile, log=log,
+                            eval_size=eval_size, pawn_size=pawn_size, book=book, tablebases=tablebases)
                 else:
                     option = 0
                     continue
@@ -237,6 +330,9 @@ def main():
             win.blit(text, (TLENGTH // 2 - 150, 100))
             depth_text = normal.render(f"difficulty = {depth}", True, (0, 0, 0))
             win.blit(depth_text, (100, 200))
+            # with a move time the AI searches as deep as it can in that many seconds instead of to the difficulty
+            time_text = normal.render(f"time = {movetime}s" if movetime else "time = off", True, (0, 0, 0))
+            win.blit(time_text, (100, 300))
 
             for event in pygame.event.get():
                 pos = pygame.mouse.get_pos()
@@ -252,6 +348,10 @@ def main():
                                 depth -= 1
                             elif val == 5:
                                 depth += 1
+                            elif val == 10:
+                                movetime = max(movetime - 1, 0)
+                            elif val == 11:
+                                movetime += 1
 
                 for button in settings:
                     button.check_hover(*pos)
@@ -266,8 +366,11 @@ def main():
 
     # write final settings to json file
     data["depth"] = depth
+    data["movetime"] = movetime
     with open("settings.json", "w") as file:
         json.dump(data, file, indent=2)
+    if ai is not None:
+        ai.close()
     pygame.quit()
 
 
@@ -0,0 +1,159 @@
+from ai import AI
+from board import Board
+import argparse
+import math
+import multiprocessing as mp
+import time
+
+MAX_PLIES = 400  # games still going after this many moves are drawn
+
+# positions a few moves into common openings, each is played twice with the engines swapping colours
+openings = [
+    "r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",  # ruy lopez
+    "rnbqkbnr/pp2pppp/3p4/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 0 3",  # sicilian
+    "rnbqkbnr/ppp2ppp/4p3/3p4/3PP3/8/PPP2PPP/RNBQKBNR w KQkq d6 0 3",  # french
+    "rnbqkbnr/pp2pppp/2p5/3p4/3PP3/8/PPP2PPP/RNBQKBNR w KQkq d6 0 3",  # caro-kann
+    "rnbqkbnr/ppp2ppp/4p3/3p4/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 0 3",  # queen's gambit declined
+    "rnbqkb1r/pppppp1p/5np1/8/2PP4/2N5/PP2PPPP/R1BQKBNR b KQkq - 1 3",  # king's indian
+    "rnbqkbnr/pppp1ppp/8/4p3/2P5/2N5/PP1PPPPP/R1BQKBNR b KQkq - 1 2",  # english
+    "rnbqkbnr/ppp1pppp/8/3p4/8/5NP1/PPPPPP1P/RNBQKB1R b KQkq - 0 2",  # king's indian attack
+    "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",  # italian
+    "rnbqk2r/pppp1ppp/4pn2/8/1bPP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4",  # nimzo-indian
+    "rnb1kbnr/ppp1pppp/8/3q4/8/8/PPPP1PPP/RNBQKBNR w KQkq - 0 3",  # scandinavian
+    "rnbqkbnr/pp2pppp/2p5/3p4/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 0 3",  # slav
+]
+
+_engines = {}  # the AIs a match process has made, by their settings, kept for every game it plays
+
+
+def parse_engine(text):
+    # settings written like depth=3,movetime=0.5,ordering=0 as AI keyword arguments
+    settings = {"depth": 3}
+    for part in filter(None, text.split(",")):
+        name, value = part.split("=")
+        settings[name] = float(value) if "." in value else int(value)
+    return settings
+
+
+def read_openings(path):
+    # one fen per line, blank lines and lines starting with # are skipped
+    with open(path, "r") as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith("#")]
+
+
+def engine(settings):
+    key = tuple(sorted(settings.items()))
+    if key not in _engines:
+        # every game is searched in this process, so the AI doesn't need a pool of its own
+        _engines[key] = AI(**settings)
+    return _engines[key]
+
+
+def best_move(ai, board):
+    result = ai.iterate(board, 64 if ai.movetime else ai.depth + 1, time.time(), ai.movetime)
+    return result["pv"][0] if result["pv"] else board.legal_moves()[0]
+
+
+def play_game(task):
+    # plays one game, returns the first engine's score, 1 for a win, 0.5 for a draw and 0 for a loss, and its length
+    fen, first, second, first_white = task
+    board = Board(string=fen)
+    white, black = (first, second) if first_white else (second, first)
+    engines = {1: engine(white), -1: engine(black)}
+    for ai in engines.values():
+        ai.table.clear()
+        if ai.orderer is not None:
+            ai.orderer.clear()
+    plies = 0
+    # board.quit covers checkmate, stalemate, the 50 move rule and threefold repetition
+    while not board.quit and plies < MAX_PLIES:
+        board.make_move(best_move(engines[board.turn], board), played=True)
+        plies += 1
+    if board.checkmated():
+        white_score = 0 if board.turn == 1 else 1
+    else:
+        white_score = 0.5
+    return white_score if first_white else 1 - white_score, plies
+
+
+def elo(score):
+    # elo difference that gives this expected score
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def statistics(wins, draws, losses):
+    # elo difference and the half width of its 95% confidence interval
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    return elo(score), (elo(min(score + margin, 1)) - elo(max(score - margin, 0))) / 2
+
+
+def sprt(wins, draws, losses, elo0=0, elo1=5, alpha=0.05, beta=0.05):
+    # sequential probability ratio test of elo0 against elo1, using the normal approximation of the game results
+    # returns the log likelihood ratio, its bounds and "H1" (elo1 is more likely), "H0" or None to keep playing
+    lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+    games = wins + draws + losses
+    llr = 0
+    if games and wins + losses:
+        score = (wins + draws / 2) / games
+        variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+        if variance > 0:
+            s0, s1 = 1 / (1 + 10 ** (-elo0 / 400)), 1 / (1 + 10 ** (-elo1 / 400))
+            llr = games * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+    verdict = "H1" if llr >= upper else "H0" if llr <= lower else None
+    return llr, lower, upper, verdict
+
+
+def report(wins, draws, losses, plies, elapsed, elo0, elo1, alpha, beta):
+    games = wins + draws + losses
+    difference, margin = statistics(wins, draws, losses)
+    llr, lower, upper, verdict = sprt(wins, draws, losses, elo0, elo1, alpha, beta)
+    print(f"games {games}: +{wins} ={draws} -{losses}, elo {difference:+.1f} +/- {margin:.1f}, "
+          f"sprt [{elo0}, {elo1}] llr {llr:.2f} ({lower:.2f}, {upper:.2f}) {verdict or 'continue'}, "
+          f"{plies / games:.0f} plies a game, {games / elapsed * 3600:.0f} games/hour")
+    return verdict
+
+
+def match(first, second, fens, rounds=1, processes=None, elo0=0, elo1=5, alpha=0.05, beta=0.05, stop=False):
+    # plays every opening rounds times with each engine as white, the games are shared out over all the cores
+    # with stop the match ends as soon as the sprt accepts either hypothesis
+    tasks = []
+    for _ in range(rounds):
+        for fen in fens:
+            tasks.append((fen, first, second, True))
+            tasks.append((fen, first, second, False))
+    wins = draws = losses = plies = 0
+    start = time.time()
+    with mp.Pool(processes) as pool:
+        for score, length in pool.imap_unordered(play_game, tasks):
+            plies += length
+            wins += score == 1
+            draws += score == 0.5
+            losses += score == 0
+            verdict = report(wins, draws, losses, plies, time.time() - start, elo0, elo1, alpha, beta)
+            if stop and verdict:
+                pool.terminate()
+                break
+    return wins, draws, losses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="play two AI settings against each other and compare their strength")
+    parser.add_argument("first", help="the first engine's settings, like depth=3,movetime=0.5,ordering=0")
+    parser.add_argument("second", help="the second engine's settings")
+    parser.add_argument("--openings", help="file of fens to start from, one per line")
+    parser.add_argument("--rounds", type=int, default=1, help="times to play each opening with each colour")
+    parser.add_argument("--processes", type=int, help="games played at once, one per core by default")
+    parser.add_argument("--elo0", type=float, default=0)
+    parser.add_argument("--elo1", type=float, default=5)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--stop", action="store_true", help="stop once the sprt has a result")
+    args = parser.parse_args()
+
+    match(parse_engine(args.first), parse_engine(args.second),
+          read_openings(args.openings) if args.openings else openings, args.rounds, args.processes,
+          args.elo0, args.elo1, args.alpha, args.beta, args.stop)
@@ -0,0 +1,55 @@
+from pieces import *
+
+MAX_PLY = 128
+# move scores, each kind of move is ordered above everything in the kinds after it
+HASH_SCORE = 1 << 40
+CAPTURE_SCORE = 1 << 36  # plus the victim's value << 16 minus the attacker's value
+PROMOTION_SCORE = 1 << 34  # plus the promoted piece's value
+KILLER_SCORE = 1 << 32  # the second killer is one lower
+HISTORY_LIMIT = 1 << 30  # history scores are halved when one gets this big
+
+
+class MoveOrderer:
+    def __init__(self):
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]  # the last two quiet moves that caused a cutoff at each ply
+        self.history = [[0] * 64 for _ in range(64)]  # cutoffs by quiet moves, indexed by from then to square
+
+    def order(self, board, moves, hash_move, ply):
+        # hash move, captures by most valuable victim then least valuable attacker, promotions, killers, history
+        squares = board.squares
+        first_killer, second_killer = self.killers[min(ply, MAX_PLY - 1)]
+        history = self.history
+
+        def score(move):
+            if move == hash_move:
+                return HASH_SCORE
+            victim = squares[move >> 6 & 63]
+            if victim:
+                return CAPTURE_SCORE + (piece_values[victim & 7] << 16) - piece_values[squares[move & 63] & 7]
+            if move >> 12:
+                return PROMOTION_SCORE + piece_values[move >> 12]
+            if move == first_killer:
+                return KILLER_SCORE
+            if move == second_killer:
+                return KILLER_SCORE - 1
+            return history[move & 63][move >> 6 & 63]
+
+        return sorted(moves, key=score, reverse=True)
+
+    def cutoff(self, board, move, ply, depth):
+        # called with the board back as it was before move, when move caused a beta cutoff
+        if board.squares[move >> 6 & 63] or move >> 12:
+            return  # captures and promotions are already ordered early
+        killers = self.killers[min(ply, MAX_PLY - 1)]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.history
+        history[move & 63][move >> 6 & 63] += depth * depth
+        if history[move & 63][move >> 6 & 63] > HISTORY_LIMIT:
+            for row in history:
+                for to in range(64):
+                    row[to] >>= 1
+
+    def clear(self):
+        self.__init__()
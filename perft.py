@@ -0,0 +1,88 @@
+from board import Board, move_name
+from constants import STRING
+import time
+
+# published perft results, the number of leaf nodes at each depth from 1
+# https://www.chessprogramming.org/Perft_Results
+suite = [
+    (STRING, [20, 400, 8902, 197281, 4865609]),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1", [6, 264, 9467, 422333]),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594]),
+]
+
+
+def perft(board, depth):
+    # number of move sequences depth moves long from the position
+    if not depth:
+        return 1
+    moves = board.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        board.make_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move()
+    return nodes
+
+
+def divide(board, depth):
+    # perft split by the first move, to find which move a wrong count comes from
+    counts = {}
+    for move in board.legal_moves():
+        board.make_move(move)
+        counts[move_name(move)] = perft(board, depth - 1)
+        board.unmake_move()
+    return counts
+
+
+def run(fen, depth, split=False):
+    board = Board(string=fen)
+    start = time.perf_counter()
+    if split:
+        counts = divide(board, depth)
+        for name in sorted(counts):
+            print(f"{name}: {counts[name]}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(board, depth)
+    elapsed = time.perf_counter() - start
+    print(f"depth {depth}: {nodes} nodes in {elapsed:.3f}s, {nodes / max(elapsed, 1e-9):.0f} nodes/s")
+    return nodes
+
+
+def run_suite(max_nodes=100000):
+    # every suite position to each depth with at most max_nodes leaves, returns the number of wrong counts
+    failures = 0
+    total = 0
+    start = time.perf_counter()
+    for fen, counts in suite:
+        board = Board(string=fen)
+        for depth, expected in enumerate(counts, 1):
+            if expected > max_nodes:
+                break
+            nodes = perft(board, depth)
+            total += nodes
+            if nodes != expected:
+                failures += 1
+                print(f"{fen} depth {depth}: {nodes} nodes, expected {expected}")
+    elapsed = time.perf_counter() - start
+    print(f"{failures} wrong, {total} nodes in {elapsed:.3f}s, {total / elapsed:.0f} nodes/s")
+    return failures
+
+
+if __name__ == "__main__":
+    # python perft.py depth [fen] [divide]
+    # python perft.py suite [max nodes]
+    import sys
+    args = sys.argv[1:]
+    if not args or args[0] == "suite":
+        sys.exit(run_suite(int(args[1]) if len(args) > 1 else 100000) != 0)
+    split = "divide" in args
+    if split:
+        args.remove("divide")
+    run(" ".join(args[1:]) or STRING, int(args[0]), split)
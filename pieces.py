@@ -21,6 +21,22 @@ class PieceType(Enum):
 pieces_dict = {"r": PieceType.Rook, "n": PieceType.Knight, "b": PieceType.Bishop, "q": PieceType.Queen,
                "k": PieceType.King, "p": PieceType.Pawn}
 
+# compact piece codes used by the board, the piece type is in the low 3 bits and black pieces have bit 3 set
+EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(7)
+BLACK = 8
+
+codes_dict = {"p": PAWN, "n": KNIGHT, "b": BISHOP, "r": ROOK, "q": QUEEN, "k": KING}
+codes_dict.update({char.upper(): code for char, code in codes_dict.items()})
+codes_dict.update({char: code | BLACK for char, code in codes_dict.items() if char.islower()})
+chars_dict = {code: char for char, code in codes_dict.items()}
+
+# PieceType values indexed by piece type code
+piece_values = [PieceType.Empty.value, PieceType.Pawn.value, PieceType.Knight.value, PieceType.Bishop.value,
+                PieceType.Rook.value, PieceType.Queen.value, PieceType.King.value]
+
+# pieces a pawn can promote to, in the order they are shown under the board
+promotion_pieces = [ROOK, KNIGHT, BISHOP, QUEEN]
+
 
 class Piece:
     def __init__(self, string="", moved=False, x=-1, y=-1, piece=None):
@@ -29,6 +45,7 @@ class Piece:
             self.color = piece.color
             self.piece_type = piece.piece_type
             self.image = piece.image
+            self.code = piece.code
             return
 
         # for blank pieces
@@ -37,6 +54,7 @@ class Piece:
             self.color = PieceColor.Empty
             self.piece_type = PieceType.Empty
             self.image = ""
+            self.code = EMPTY
             return
 
         if string.isupper():
@@ -47,6 +65,7 @@ class Piece:
         self.piece_type = pieces_dict[string.lower()]
         self.moved = moved
         self.image = string
+        self.code = codes_dict[string]
 
         if self.piece_type == PieceType.Pawn:
             if self.color == PieceColor.White and y != 6 or self.color == PieceColor.Black and y != 1:
@@ -70,6 +89,11 @@ class Piece:
         return f"{color}{type}"
 
 
+# one shared read only Piece per code, this is what the GUI sees of the board
+code_pieces = {code: Piece(char) for code, char in chars_dict.items()}
+code_pieces[EMPTY] = Piece()
+
+
 class Cell:
     def __init__(self, x, y, lcolor, rcolor):
         self.xcoor = x * CLENGTH
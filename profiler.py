@@ -0,0 +1,82 @@
+from time import perf_counter
+import json
+
+CUTOFF_SLOTS = 16  # cutoffs are counted by the index of the move that caused them, the last slot counts the rest
+
+
+class Profiler:
+    # counts and times what a search does, the AI only has one while profiling is turned on
+    # methods are timed by wrapping them on the object they belong to, so nothing is added to them otherwise
+    def __init__(self):
+        self.counters = {}
+        self.timings = {}
+        self.cutoffs = [0] * CUTOFF_SLOTS
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def cutoff(self, index):
+        self.cutoffs[min(index, CUTOFF_SLOTS - 1)] += 1
+
+    def timed(self, name, function):
+        # function wrapped to count its calls and the time spent in it
+        counters = self.counters
+        timings = self.timings
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            value = function(*args, **kwargs)
+            timings[name] = timings.get(name, 0) + perf_counter() - start
+            counters[name] = counters.get(name, 0) + 1
+            return value
+        return wrapper
+
+    def attach(self, obj, names):
+        # times the methods in names (method name: phase name) on this object only
+        for method, name in names.items():
+            setattr(obj, method, self.timed(name, getattr(obj, method)))
+
+    def detach(self, obj, names):
+        # takes attach's wrappers off again, so an object used for more than one search isn't wrapped twice
+        for method in names:
+            obj.__dict__.pop(method, None)
+
+    def snapshot(self):
+        return {"counters": dict(self.counters), "timings": dict(self.timings), "cutoffs": self.cutoffs[:]}
+
+    def reset(self):
+        # cleared in place, the wrapped methods keep adding to the same dicts
+        self.counters.clear()
+        self.timings.clear()
+        self.cutoffs = [0] * CUTOFF_SLOTS
+
+
+def merge(profiles):
+    # the snapshots of several workers added together
+    total = {"counters": {}, "timings": {}, "cutoffs": [0] * CUTOFF_SLOTS}
+    for profile in profiles:
+        for kind in ("counters", "timings"):
+            for name, value in profile[kind].items():
+                total[kind][name] = total[kind].get(name, 0) + value
+        total["cutoffs"] = [a + b for a, b in zip(total["cutoffs"], profile["cutoffs"])]
+    return total
+
+
+def print_stats(stats):
+    # the default hook, a short summary of each search
+    print(f"depth {stats['depth']}, score {stats['score']}, pv {' '.join(stats['pv'])}")
+    print(f"{stats['nodes']} nodes ({stats['qnodes']} quiescence) on {stats['workers']} workers, "
+          f"branching factor {stats['ebf']:.2f}, tt hits {stats['hits']}/{stats['probes']} "
+          f"({stats['hits'] / max(stats['probes'], 1):.1%}), {stats['fill']:.1%} full, {stats['time']:.3f}s")
+    print(f"eval cache hits {stats['eval_hits'] / max(stats['eval_probes'], 1):.1%}, "
+          f"pawn table hits {stats['pawn_hits'] / max(stats['pawn_probes'], 1):.1%}")
+
+
+class StatsLog:
+    # a hook writing every search's statistics to a file as a line of json
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, stats):
+        with open(self.path, "a") as file:
+            file.write(json.dumps(stats) + "\n")
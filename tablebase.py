@@ -0,0 +1,462 @@
+from bitboard import king_attacks, squares_of
+from pieces import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, BLACK
+from functools import lru_cache
+import mmap
+import numpy as np
+import os
+import sys
+
+# a table has a byte for every position of its pieces with either side to move, the kings take one of the ways of
+# placing two kings that are different under the board's symmetries and the other pieces a square each, so the index
+# is the side to move, then the king placement, then each other piece's square, 6 bits each
+# the pieces are in the order white king, black king, white pieces then black pieces
+# 0 is a draw, 1 to 127 the side to move mates in that many plies and 128 + n it is mated in n plies
+LOSS = 128
+MATE = 1000  # while generating, a win in n plies scores MATE - n and a loss -(MATE - n)
+NONE = -MATE - 1  # while generating, the score of a position none of whose moves leave the table
+CHUNK = 1 << 18  # positions worked on at once while generating
+DIRECTORY = "tablebases"
+materials = ["KQK", "KRK", "KPK"]  # built by default, any other material can be named on the command line
+
+letters = {KING: "K", QUEEN: "Q", ROOK: "R", BISHOP: "B", KNIGHT: "N", PAWN: "P"}
+kinds = {letter: kind for kind, letter in letters.items()}
+letter_values = {"Q": 9, "R": 5, "B": 3, "N": 3, "P": 1, "K": 0}
+ORDER = "KQRBNP"  # the order pieces of one side are given their squares in
+
+
+def _symmetry(swap, flip_y, flip_x):
+    # where each square goes when the board is turned, swap reflects it in the a8-h1 diagonal
+    table = []
+    for sq in range(64):
+        x, y = sq & 7, sq >> 3
+        if swap:
+            x, y = y, x
+        table.append((7 - y if flip_y else y) << 3 | (7 - x if flip_x else x))
+    return table
+
+
+# the 8 symmetries of the board, the first two, nothing and the mirror left to right, are the ones pawns allow
+symmetries = np.array([_symmetry(swap, flip_y, flip_x) for swap in (0, 1) for flip_y in (0, 1) for flip_x in (0, 1)])
+
+
+def _targets(offsets, steps=1):
+    # (64, len(offsets), steps) squares reached going each offset once or more, -1 once it's off the board
+    table = np.full((64, len(offsets), steps), -1)
+    for sq in range(64):
+        for i, (dx, dy) in enumerate(offsets):
+            x, y = sq & 7, sq >> 3
+            for step in range(steps):
+                x, y = x + dx, y + dy
+                if not (0 <= x < 8 and 0 <= y < 8):
+                    break
+                table[sq, i, step] = y * 8 + x
+    return table
+
+
+king_offsets = [(0, -1), (0, 1), (-1, 0), (1, 0), (1, -1), (-1, -1), (1, 1), (-1, 1)]
+knight_offsets = [(2, -1), (2, 1), (1, -2), (1, 2), (-2, -1), (-2, 1), (-1, -2), (-1, 2)]
+king_targets = _targets(king_offsets)[:, :, 0]
+knight_targets = _targets(knight_offsets)[:, :, 0]
+rook_rays = _targets(king_offsets[:4], 7)
+bishop_rays = _targets(king_offsets[4:], 7)
+pawn_captures = [_targets([(-1, -1), (1, -1)])[:, :, 0], _targets([(-1, 1), (1, 1)])[:, :, 0]]  # white, black
+
+
+def _attack_table(targets):
+    # (64, 64) True where a piece on the first square attacks the second
+    table = np.zeros((64, 64), dtype=bool)
+    for sq in range(64):
+        table[sq, targets[sq][targets[sq] >= 0]] = True
+    return table
+
+
+king_table = _attack_table(king_targets)
+knight_table = _attack_table(knight_targets)
+pawn_tables = [_attack_table(pawn_captures[0]), _attack_table(pawn_captures[1])]
+rook_lines = _attack_table(rook_rays.reshape(64, -1))
+bishop_lines = _attack_table(bishop_rays.reshape(64, -1))
+between = np.zeros((64, 64, 64), dtype=bool)  # True where the third square is on the line between the first two
+for _rays in (rook_rays, bishop_rays):
+    for _sq in range(64):
+        for _ray in _rays[_sq]:
+            _ray = _ray[_ray >= 0]
+            for _i, _to in enumerate(_ray):
+                between[_sq, _to, _ray[:_i]] = True
+
+
+class Layout:
+    # how the positions of a table are numbered, boards are turned so the kings are on one of the placements that
+    # are different under the symmetries, with pawns on the board they can only be mirrored left to right
+    def __init__(self, pawns):
+        turns = symmetries[:2 if pawns else 8]
+        placements = {}
+        self.turn = np.zeros(4096, dtype=np.int64)  # the symmetry that puts each pair of king squares in place
+        for white in range(64):
+            for black in range(64):
+                if white == black or king_attacks[white] >> black & 1:
+                    continue
+                keys = turns[:, white] << 6 | turns[:, black]
+                self.turn[white << 6 | black] = keys.argmin()
+                placements[white << 6 | black] = keys.min()
+        self.kings = np.array(sorted(set(placements.values())))  # white king square << 6 | black king square
+        number = {key: i for i, key in enumerate(self.kings.tolist())}
+        self.placement = np.full(4096, -1, dtype=np.int64)
+        for key, canonical in placements.items():
+            self.placement[key] = number[canonical]
+        self.symmetries = symmetries
+        # lists are quicker than arrays for probing one position
+        self.turn_list = self.turn.tolist()
+        self.placement_list = self.placement.tolist()
+        self.symmetry_lists = symmetries.tolist()
+
+    def size(self, count):
+        # positions for each side to move in a table of count pieces
+        return len(self.kings) << 6 * (count - 2)
+
+    def index(self, squares, stm):
+        key = squares[0] << 6 | squares[1]
+        turn = self.symmetry_lists[self.turn_list[key]]
+        index = stm * len(self.kings) + self.placement_list[key]
+        for sq in squares[2:]:
+            index = index << 6 | turn[sq]
+        return index
+
+    def indices(self, squares, stm):
+        # index for (count, n) arrays of squares, the positions are one per column
+        key = squares[0] << 6 | squares[1]
+        turn = self.turn[key]
+        index = stm * len(self.kings) + self.placement[key]
+        for row in squares[2:]:
+            index = index << 6 | self.symmetries[turn, row]
+        return index
+
+    def squares(self, indices, count):
+        # (count, n) squares of the positions with these indices less the side to move
+        others = []
+        for _ in range(count - 2):
+            others.append(indices & 63)
+            indices = indices >> 6
+        kings = self.kings[indices]
+        return np.stack([kings >> 6, kings & 63] + others[::-1])
+
+
+layouts = [Layout(False), Layout(True)]
+
+
+def side_name(letters_of_side):
+    return "K" + "".join(sorted(letters_of_side, key=ORDER.index))
+
+
+def drawn(name):
+    # no pawns, rooks or queens and a single minor piece at most, neither side can mate
+    extras = name[1:].replace("K", "")
+    return len(extras) <= 1 and all(letter in "BN" for letter in extras)
+
+
+@lru_cache(maxsize=None)
+def orientation(codes):
+    # the table for pieces with these codes, whether the colours are swapped to find them in it (BLACK if they are)
+    # and the order the pieces are in there, the table has the stronger pieces as white
+    white = side_name(letters[code & 7] for code in codes if code & 7 != KING and not code & BLACK)
+    black = side_name(letters[code & 7] for code in codes if code & 7 != KING and code & BLACK)
+    flip = 0
+    if (sum(map(letter_values.get, black)), black) > (sum(map(letter_values.get, white)), white):
+        white, black = black, white
+        flip = BLACK
+    order = sorted(range(len(codes)), key=lambda i: ((codes[i] & 7) != KING, (codes[i] ^ flip) & BLACK,
+                                                     ORDER.index(letters[codes[i] & 7])))
+    return white + black, flip, order
+
+
+def piece_codes(name):
+    # the piece codes of a table's pieces in table order
+    black = name.index("K", 1)
+    return [KING, KING | BLACK] + [kinds[letter] for letter in name[1:black]] + \
+        [kinds[letter] | BLACK for letter in name[black + 1:]]
+
+
+def decode(value):
+    # a stored byte as (1 win, 0 draw or -1 loss for the side to move, plies to mate)
+    if not value:
+        return 0, 0
+    if value < LOSS:
+        return 1, value
+    return -1, value - LOSS
+
+
+def encode(scores):
+    # an array of scores as the bytes stored for them
+    if np.any((scores != 0) & (MATE - abs(scores) >= LOSS)):
+        raise ValueError("a mate is too long to store")
+    return np.where(scores > 0, MATE - scores, np.where(scores < 0, LOSS + MATE + scores, 0)).astype(np.uint8).tobytes()
+
+
+def attacked(targets, codes, squares, side, alive=None):
+    # True for each position where a piece of side (0 white, 1 black) attacks its target square
+    # alive is a row for each piece of whether it's still on the board
+    hit = np.zeros(len(targets), dtype=bool)
+    for i, code in enumerate(codes):
+        if code >> 3 != side:
+            continue
+        sq = squares[i]
+        kind = code & 7
+        if kind == KING:
+            attacks = king_table[sq, targets]
+        elif kind == KNIGHT:
+            attacks = knight_table[sq, targets]
+        elif kind == PAWN:
+            attacks = pawn_tables[side][sq, targets]
+        else:
+            attacks = (rook_lines[sq, targets] if kind != BISHOP else False) | \
+                (bishop_lines[sq, targets] if kind != ROOK else False)
+            for j in range(len(codes)):
+                if j != i:
+                    attacks &= ~(between[sq, targets, squares[j]] & (True if alive is None else alive[j]))
+        hit |= attacks & (True if alive is None else alive[i])
+    return hit
+
+
+def moves(codes, squares, stm):
+    # every move the side to move has in each position, as the piece moved, its target squares, where it's legal and
+    # the piece it captures, -1 for none
+    side = BLACK if stm else 0
+    count = len(codes)
+    enemy = np.array([code & BLACK != side and code & 7 != KING for code in codes])  # the pieces that can be taken
+    for i, code in enumerate(codes):
+        if code & BLACK != side:
+            continue
+        sq = squares[i]
+        kind = code & 7
+
+        def occupant(target):
+            found = np.full(len(target), -1)
+            for j in range(count):
+                if j != i:
+                    found[squares[j] == target] = j
+            return found
+
+        def move(target, ok, found):
+            # the move if it doesn't take its own piece or the king or leave its king in check
+            ok = ok & ((found < 0) | enemy[found])
+            captured = np.where(found >= 0, found, -1)
+            moved = squares.copy()
+            moved[i] = target
+            alive = np.stack([captured != j for j in range(count)])
+            ok &= ~attacked(moved[stm], codes, moved, stm ^ 1, alive)
+            return i, target, ok, captured
+
+        if kind in (KING, KNIGHT):
+            for target in (king_targets if kind == KING else knight_targets)[sq].T:
+                yield move(np.maximum(target, 0), target >= 0, occupant(np.maximum(target, 0)))
+        elif kind == PAWN:
+            step = 8 if stm else -8
+            one = sq + step
+            empty = occupant(one) < 0
+            yield move(one, empty, np.full(len(sq), -1))
+            two = np.where(sq >> 3 == (1 if stm else 6), sq + 2 * step, one)
+            yield move(two, empty & (two != one) & (occupant(two) < 0), np.full(len(sq), -1))
+            for target in pawn_captures[stm][sq].T:
+                found = occupant(np.maximum(target, 0))
+                yield move(np.maximum(target, 0), (target >= 0) & (found >= 0), found)
+        else:
+            rays = [rook_rays] * (kind != BISHOP) + [bishop_rays] * (kind != ROOK)
+            for ray in rays:
+                for direction in range(4):
+                    open_ = np.ones(len(sq), dtype=bool)
+                    for step in range(7):
+                        target = ray[sq, direction, step]
+                        open_ &= target >= 0
+                        found = occupant(np.maximum(target, 0))
+                        yield move(np.maximum(target, 0), open_.copy(), found)
+                        open_ &= found < 0
+                        if not open_.any():
+                            break
+
+
+class Tablebases:
+    def __init__(self, directory=DIRECTORY):
+        # tables are memory mapped when first probed, so every process probing them shares the same pages
+        self.directory = directory
+        self.tables = {}
+        self.arrays = {}
+        self.files = []
+        names = [name[:-3] for name in os.listdir(directory) if name.endswith(".tb")] if os.path.isdir(directory) \
+            else []
+        self.pieces = max((len(name) for name in names), default=0)  # most pieces in any table
+
+    def table(self, name):
+        # the table's bytes, or None if it hasn't been made
+        if name not in self.tables:
+            path = os.path.join(self.directory, name + ".tb")
+            if not os.path.isfile(path):
+                return None
+            file = open(path, "rb")
+            self.files.append(file)
+            self.tables[name] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.tables[name]
+
+    def value(self, codes, squares, turn):
+        # (result, plies) for the side to move with pieces of these codes on these squares, or None
+        name, flip, order = orientation(tuple(codes))
+        if drawn(name):
+            return 0, 0
+        table = self.table(name)
+        if table is None:
+            return None
+        stm = (turn == -1) ^ bool(flip)
+        flip = 56 if flip else 0
+        layout = layouts["P" in name]
+        return decode(table[layout.index([squares[i] ^ flip for i in order], stm)])
+
+    def scores(self, codes, squares, stm):
+        # scores as the generator counts them for (count, n) arrays of squares with stm (0 white, 1 black) to move
+        name, flip, order = orientation(tuple(codes))
+        if drawn(name):
+            return np.zeros(squares.shape[1], dtype=np.int64)
+        if name not in self.arrays:
+            self.arrays[name] = np.frombuffer(self.table(name), dtype=np.uint8)
+        layout = layouts["P" in name]
+        stored = self.arrays[name][layout.indices(squares[order] ^ (56 if flip else 0), stm ^ bool(flip))]
+        stored = stored.astype(np.int64)
+        return np.where(stored == 0, 0, np.where(stored < LOSS, MATE - stored, stored - LOSS - MATE))
+
+    def probe(self, board):
+        # (1 win, 0 draw or -1 loss for the side to move, plies to mate) if the board is in a table, otherwise None
+        occupied = board.occupied[0] | board.occupied[1]
+        if board.castling or board.ep != -1 or bin(occupied).count("1") > self.pieces:
+            return None
+        squares = squares_of(occupied)
+        return self.value([board.squares[sq] for sq in squares], squares, board.turn)
+
+    def close(self):
+        self.arrays = {}
+        for table in self.tables.values():
+            table.close()
+        for file in self.files:
+            file.close()
+        self.tables = {}
+        self.files = []
+
+
+def generate(name, tablebases):
+    # retrograde analysis of the table, captures and promotions lead to positions in tables tablebases already has
+    # returns the table as bytes
+    codes = piece_codes(name)
+    count = len(codes)
+    layout = layouts["P" in name]
+    size = layout.size(count)
+    scores = np.zeros(2 * size, dtype=np.int64)
+    # the best score from a move leaving the table, or mate or stalemate for positions with no moves
+    exits = np.full(2 * size, NONE, dtype=np.int64)
+    valid = np.zeros(2 * size, dtype=bool)
+
+    def later(score):
+        # a position's score as the side moving to it sees it, a ply further from mate
+        return np.sign(score) - score
+
+    for stm in (0, 1):
+        for start in range(0, size, CHUNK):
+            indices = np.arange(start, min(start + CHUNK, size))
+            squares = layout.squares(indices, count)
+            ok = np.ones(len(indices), dtype=bool)
+            for i in range(count):
+                for j in range(i):
+                    ok &= squares[i] != squares[j]
+                if codes[i] & 7 == PAWN:
+                    ok &= (squares[i] >> 3 != 0) & (squares[i] >> 3 != 7)
+            # the side that just moved can't be in check
+            ok &= ~attacked(squares[stm ^ 1], codes, squares, stm)
+            indices = indices[ok] + stm * size
+            squares = squares[:, ok]
+            valid[indices] = True
+            best = np.full(len(indices), NONE)
+            any_move = np.zeros(len(indices), dtype=bool)
+            for i, target, legal, captured in moves(codes, squares, stm):
+                any_move |= legal
+                promotes = (codes[i] & 7 == PAWN) & ((target >> 3 == 0) | (target >> 3 == 7))
+                # the moves are grouped by the table they lead to, the piece they take and whether they promote
+                for piece, promoting in set(zip(captured[legal].tolist(), promotes[legal].tolist())):
+                    if piece < 0 and not promoting:
+                        continue
+                    leaving = legal & (captured == piece) & (promotes == promoting)
+                    kept = [j for j in range(count) if j != piece]
+                    moved = squares[:, leaving].copy()
+                    moved[i] = target[leaving]
+                    for kind in (QUEEN, ROOK, BISHOP, KNIGHT) if promoting else (None,):
+                        child = [(kind | codes[i] & BLACK) if kind and j == i else codes[j] for j in kept]
+                        score = later(tablebases.scores(child, moved[kept], stm ^ 1))
+                        best[leaving] = np.maximum(best[leaving], score)
+            in_check = attacked(squares[stm], codes, squares, stm ^ 1)
+            best[~any_move] = np.where(in_check[~any_move], -MATE, 0)
+            exits[indices] = best
+
+    # every pass works out each position from the last pass's scores of the positions its moves lead to
+    # a score n plies from mate found on the nth pass or before is right, so those positions aren't worked out again
+    # and it's done once a pass changes nothing
+    done = 0
+    while True:
+        changed = False
+        settled = (scores != 0) & (MATE - abs(scores) <= done)
+        for stm in (0, 1):
+            pending = np.nonzero(valid[stm * size:(stm + 1) * size] & ~settled[stm * size:(stm + 1) * size])[0]
+            for start in range(0, len(pending), CHUNK):
+                indices = pending[start:start + CHUNK]
+                squares = layout.squares(indices, count)
+                indices = indices + stm * size
+                best = exits[indices].copy()
+                for i, target, legal, captured in moves(codes, squares, stm):
+                    if codes[i] & 7 == PAWN:
+                        legal = legal & (target >> 3 != 0) & (target >> 3 != 7)
+                    legal &= captured < 0
+                    if not legal.any():
+                        continue
+                    moved = squares[:, legal]
+                    moved[i] = target[legal]
+                    score = later(scores[layout.indices(moved, stm ^ 1)])
+                    best[legal] = np.maximum(best[legal], score)
+                changed |= bool(np.any(best != scores[indices]))
+                scores[indices] = best
+        done += 1
+        if not changed:
+            break
+    return encode(scores)
+
+
+def build(names=None, directory=DIRECTORY):
+    # makes the tables that don't exist yet, with any tables captures and promotions lead to made first
+    os.makedirs(directory, exist_ok=True)
+    tablebases = Tablebases(directory)
+
+    def make(name):
+        path = os.path.join(directory, name + ".tb")
+        if os.path.isfile(path) or drawn(name):
+            return
+        codes = piece_codes(name)
+        # the tables a capture or a promotion leads to
+        for piece in range(2, len(codes)):
+            smaller = codes[:piece] + codes[piece + 1:]
+            make(orientation(tuple(smaller))[0])
+            if codes[piece] & 7 == PAWN:
+                for kind in (QUEEN, ROOK, BISHOP, KNIGHT):
+                    make(orientation(tuple(codes[:piece] + [kind | codes[piece] & BLACK] + codes[piece + 1:]))[0])
+        table = generate(name, tablebases)
+        with open(path, "wb") as file:
+            file.write(table)
+        print(f"{name}: {summary(table, name)}")
+
+    for name in names or materials:
+        make(orientation(tuple(piece_codes(name)))[0])
+    tablebases.close()
+
+
+def summary(table, name):
+    # the results of the positions with white to move and the longest mate
+    white = np.frombuffer(table, dtype=np.uint8)[:len(table) // 2]
+    wins = (white > 0) & (white < LOSS)
+    return f"{len(table)} bytes, white to move wins {wins.sum()}, loses {(white >= LOSS).sum()}, " \
+           f"draws or isn't legal {(white == 0).sum()}, longest mate {white[wins].max(initial=0)} plies"
+
+
+if __name__ == "__main__":
+    # python tablebase.py [material ...], like KQK or KRKN
+    build(sys.argv[1:])
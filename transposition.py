@@ -0,0 +1,97 @@
+from array import array
+from multiprocessing import shared_memory
+
+# what a stored score says about the real score of the position
+EXACT, LOWER, UPPER = 1, 2, 3
+SCORE_OFFSET = 1 << 31  # scores are stored unsigned
+
+
+class TranspositionTable:
+    def __init__(self, size=16, shared=False, name=None):
+        # size is the memory budget in MB, each 32 byte bucket holds a depth preferred and an always replace entry
+        # every entry is two 64 bit words, the position key xored with the data then move | score << 16 | depth << 48 |
+        # bound << 56, so an entry half written by another process doesn't match any key and is ignored
+        # a shared table lives in shared memory, other processes open it by passing its name
+        self.size = size
+        self.buckets = max(1, size * 1024 * 1024 // 32)
+        self.memory = None
+        self.owner = False
+        if name is not None:
+            self.memory = shared_memory.SharedMemory(name)
+        elif shared:
+            self.memory = shared_memory.SharedMemory(create=True, size=self.buckets * 32)
+            self.owner = True
+        if self.memory is None:
+            self.name = None
+            self.entries = array("Q", bytes(self.buckets * 32))
+        else:
+            self.name = self.memory.name
+            self.entries = self.memory.buf.cast("Q")
+        self.probes = self.hits = self.stores = 0
+
+    def __reduce__(self):
+        # other processes get their own table of the same size rather than a copy of this one, or open a shared one
+        return process_table, (self.size, self.name)
+
+    def probe(self, key):
+        # (depth, score, bound, move) stored for the key, or None
+        self.probes += 1
+        entries = self.entries
+        i = key % self.buckets * 4
+        data = entries[i + 1]
+        if not data or entries[i] ^ data != key:
+            data = entries[i + 3]
+            if not data or entries[i + 2] ^ data != key:
+                return None
+        self.hits += 1
+        return data >> 48 & 0xFF, (data >> 16 & 0xFFFFFFFF) - SCORE_OFFSET, data >> 56, data & 0xFFFF
+
+    def store(self, key, depth, score, bound, move):
+        entries = self.entries
+        i = key % self.buckets * 4
+        data = move | (score + SCORE_OFFSET) << 16 | depth << 48 | bound << 56
+        # the first entry keeps the deepest search, anything shallower goes in the second
+        old = entries[i + 1]
+        if entries[i] ^ old == key or depth >= old >> 48 & 0xFF:
+            entries[i] = key ^ data
+            entries[i + 1] = data
+        else:
+            entries[i + 2] = key ^ data
+            entries[i + 3] = data
+        self.stores += 1
+
+    def fill(self):
+        # fraction of entries in use, from the first 1000 buckets
+        sample = min(self.buckets, 1000)
+        used = sum(1 for i in range(1, sample * 4, 2) if self.entries[i])
+        return used / (sample * 2)
+
+    def reset_stats(self):
+        self.probes = self.hits = self.stores = 0
+
+    def clear(self):
+        if self.memory is None:
+            self.entries = array("Q", bytes(self.buckets * 32))
+        else:
+            self.memory.buf[:] = bytes(self.buckets * 32)
+        self.reset_stats()
+
+    def close(self):
+        # frees a shared table, the process that made it removes it once everything is done with it
+        if self.memory is not None:
+            self.entries.release()
+            self.memory.close()
+            if self.owner:
+                self.memory.unlink()
+            self.memory = None
+
+
+_process_tables = {}
+
+
+def process_table(size, name=None):
+    # the table of this size for the current process, so every task a pool worker runs shares one
+    # with a name it's the shared table of that name
+    if (size, name) not in _process_tables:
+        _process_tables[size, name] = TranspositionTable(size, name=name)
+    return _process_tables[size, name]
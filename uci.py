@@ -0,0 +1,187 @@
+from ai import AI, TABLEBASE_WIN
+from board import Board, move_name
+from constants import STRING
+import queue
+import sys
+import threading
+
+NAME = "Chess by Ismail Choudhury"
+DEFAULT_DEPTH = 4  # for a go without a depth or time limit
+MATE = 9999999  # Board.evaluate's score for checkmate
+
+
+def parse_move(board, text):
+    # the legal move written in uci notation, like e2e4 or e7e8q, or None
+    for move in board.legal_moves():
+        if move_name(move) == text:
+            return move
+    return None
+
+
+def score_text(score, pv):
+    # the score as uci gives it, mates in moves rather than centipawns
+    # a mate is found at the end of the principal variation, a tablebase win that many plies on from where it was probed
+    if score is None or abs(score) < TABLEBASE_WIN - 1000:
+        return f"cp {score or 0}"
+    plies = len(pv) + (0 if abs(score) >= MATE else TABLEBASE_WIN - abs(score))
+    return f"mate {(plies + 1) // 2 if score > 0 else -(plies // 2)}"
+
+
+class UCI:
+    # reads uci commands and answers them, the search runs in the AI's workers so stop can be read while it thinks
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.hash_size = 16
+        self.threads = 1
+        self.board = Board(string=STRING)
+        self.ai = None
+        self.infinite = False  # the search's bestmove waits for stop
+        self.new_ai()
+
+    def send(self, line):
+        self.output.write(line + "\n")
+        self.output.flush()
+
+    def new_ai(self):
+        if self.ai is not None:
+            self.ai.close()
+        self.ai = AI(DEFAULT_DEPTH, self.hash_size, workers=self.threads)
+        self.ai.hooks = [self.info]
+        self.ai.start()
+
+    def report(self):
+        # a line for each depth the main search has finished since the last call
+        for report in self.ai.progress():
+            nodes, elapsed = report["nodes"], report["time"]
+            self.send(f"info depth {report['depth']} score {score_text(report['score'], report['pv'])} "
+                      f"nodes {nodes} nps {int(nodes / max(elapsed, 0.001))} time {int(elapsed * 1000)} "
+                      f"pv {' '.join(move_name(move) for move in report['pv'])}")
+
+    def info(self, stats):
+        # a stats hook, any depths not sent yet then the result with the nodes of every worker
+        self.report()
+        nodes = stats["nodes"] + stats["qnodes"]
+        self.send(f"info depth {stats['depth']} score {score_text(stats['score'], stats['pv'])} nodes {nodes} "
+                  f"nps {int(nodes / max(stats['time'], 0.001))} time {int(stats['time'] * 1000)} "
+                  f"hashfull {int(stats['fill'] * 1000)} pv {' '.join(stats['pv'])}")
+
+    def handle(self, line):
+        # False once the engine should exit
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        if command == "uci":
+            self.send(f"id name {NAME}")
+            self.send("id author Ismail Choudhury")
+            self.send("option name Hash type spin default 16 min 1 max 1024")
+            self.send("option name Threads type spin default 1 min 1 max 64")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.setoption(args)
+        elif command == "ucinewgame":
+            self.stop()
+            self.new_ai()
+        elif command == "position":
+            self.stop()
+            self.position(args)
+        elif command == "go":
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            self.ai.close()
+            return False
+        return True
+
+    def setoption(self, args):
+        # setoption name <id> value <x>
+        if "value" not in args:
+            return
+        name = " ".join(args[1:args.index("value")]).lower()
+        value = " ".join(args[args.index("value") + 1:])
+        if name == "hash":
+            self.hash_size = max(1, int(value))
+        elif name == "threads":
+            self.threads = max(1, int(value))
+        else:
+            return
+        self.stop()
+        self.new_ai()
+
+    def position(self, args):
+        # position startpos|fen <fen> [moves <move> ...]
+        moves = args.index("moves") if "moves" in args else len(args)
+        if args and args[0] == "fen":
+            self.board = Board(string=" ".join(args[1:moves]))
+        else:
+            self.board = Board(string=STRING)
+        for text in args[moves + 1:]:
+            move = parse_move(self.board, text)
+            if move is None:
+                break
+            self.board.make_move(move, played=True)
+
+    def go(self, args):
+        # go depth <n> | movetime <ms> | wtime <ms> btime <ms> [winc <ms> binc <ms>] | infinite
+        self.stop()
+        if not self.board.legal_moves():
+            self.send("bestmove 0000")
+            return
+        limits = {args[i]: int(args[i + 1]) for i in range(len(args) - 1) if args[i + 1].lstrip("-").isdigit()}
+        white = self.board.turn == 1
+        movetime = clock = None
+        increment = 0
+        if "movetime" in limits:
+            movetime = limits["movetime"] / 1000
+        elif ("wtime" if white else "btime") in limits:
+            clock = limits["wtime" if white else "btime"] / 1000
+            increment = limits.get("winc" if white else "binc", 0) / 1000
+        if "infinite" in args:
+            self.ai.depth = 63
+        else:
+            self.ai.depth = limits.get("depth", 64 if movetime or clock else DEFAULT_DEPTH) - 1
+        self.infinite = "infinite" in args
+        self.ai.begin(self.board, movetime, clock, increment)
+
+    def poll(self):
+        # sends each depth as it's finished and the move once the search is done, go infinite waits for stop
+        if not self.ai.thinking():
+            return
+        self.report()
+        if self.ai.ready() and not self.infinite:
+            self.send(f"bestmove {move_name(self.ai.result())}")
+
+    def stop(self):
+        self.infinite = False
+        if self.ai.thinking():
+            self.send(f"bestmove {move_name(self.ai.finish())}")
+
+    def run(self, lines=None):
+        # stdin is read on another thread so the search can be polled between commands
+        # it's read through its own file object, a pool process forked while the thread waits on sys.stdin would
+        # otherwise hang closing it
+        if lines is None:
+            lines = open(sys.stdin.fileno(), closefd=False)
+        commands = queue.Queue()
+
+        def read():
+            for line in lines:
+                commands.put(line)
+            commands.put("quit")
+        threading.Thread(target=read, daemon=True).start()
+        while True:
+            try:
+                line = commands.get(timeout=0.01)
+            except queue.Empty:
+                self.poll()
+                continue
+            if not self.handle(line):
+                break
+
+
+if __name__ == "__main__":
+    UCI().run()
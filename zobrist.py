@@ -0,0 +1,21 @@
+from random import Random
+
+# random 64 bit numbers for each part of a position, xored together to make the position's key
+_random = Random(2023)
+piece_keys = [[_random.getrandbits(64) for sq in range(64)] for code in range(16)]
+turn_key = _random.getrandbits(64)  # in the key when black is to move
+castling_keys = [_random.getrandbits(64) for rights in range(16)]
+castling_keys[0] = 0
+# one key per en passant square, the extra last entry is 0 so ep_keys[-1] is no en passant square
+ep_keys = [_random.getrandbits(64) for sq in range(64)] + [0]
+
+
+def compute_key(board):
+    # the key worked out from scratch, make_move keeps Board.key up to date without this
+    key = 0
+    for sq, code in enumerate(board.squares):
+        if code:
+            key ^= piece_keys[code][sq]
+    if board.turn == -1:
+        key ^= turn_key
+    return key ^ castling_keys[board.castling] ^ ep_keys[board.ep]